@@ -0,0 +1,161 @@
+# almacen.py
+"""Almacén de datasets compartido por todas las sesiones: float32 mapeado desde disco y contado por referencias.
+
+Cada dataset 'Potencia_kW' se guarda una sola vez como .npy (valores float32 + marcas de tiempo int64) y se abre
+con `mmap_mode='r'`; todas las sesiones que lo usan comparten el mismo DataFrame de solo lectura y el mismo cubo
+agregado. Una sesión guarda únicamente un `Manejador`; al liberarlo (o al recolectarse la sesión) baja la cuenta
+y, con cero referencias, el dataset sale de memoria y se borran sus archivos. No es una caché persistente (para eso
+está `cache_series`, con su límite y su versión): cada proceso escribe en su propio subdirectorio
+`proceso-<pid>-*` del directorio base, que se borra al cerrar el almacén. Así dos servidores (o un servidor y
+`lote.py`) pueden compartir el directorio base sin pisarse; al arrancar solo se borran los subdirectorios de
+procesos que ya no existen.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+import numpy as np
+import pandas as pd
+from analisis import CuboAgregado, horas_por_muestra
+from cache_series import huella_dataframe
+
+DIRECTORIO_ALMACEN = os.environ.get('POWERSMART_ALMACEN_DIR', os.path.join('.cache', 'almacen'))
+PREFIJO_PROCESO = 'proceso-'
+
+
+def _proceso_vivo(pid: int) -> bool:
+    """Si el proceso `pid` sigue existiendo; ante la duda (sin permiso, o fuera de POSIX) se asume que sí."""
+    if os.name != 'posix': return True  # en Windows os.kill(pid, 0) terminaría el proceso
+    try: os.kill(pid, 0)
+    except ProcessLookupError: return False
+    except OSError: return True
+    return True
+
+
+def _limpiar_huerfanos(base: str):
+    """Borra los subdirectorios que dejaron procesos ya terminados (reinicio o caída); nunca toca los de otro proceso vivo."""
+    for nombre in os.listdir(base):
+        pid = nombre[len(PREFIJO_PROCESO):].split('-', 1)[0]
+        if not nombre.startswith(PREFIJO_PROCESO) or not pid.isdigit() or _proceso_vivo(int(pid)): continue
+        shutil.rmtree(os.path.join(base, nombre), ignore_errors=True)
+
+
+class _Entrada:
+    """Dataset abierto: buffers mapeados, DataFrame compartido, cubo perezoso y cuenta de referencias."""
+
+    def __init__(self, clave: str, valores: np.memmap, marcas: np.memmap, meta: dict):
+        self.clave, self.valores, self.marcas, self.refs = clave, valores, marcas, 0
+        self.horas_muestra = meta.get('horas_muestra')
+        idx = pd.DatetimeIndex(marcas.view('datetime64[ns]'), name=meta.get('nombre_indice'))
+        if meta.get('tz'): idx = idx.tz_localize('UTC').tz_convert(meta['tz'])  # las marcas son ns UTC; se vuelve a la hora local
+        if meta.get('freq'): idx.freq = meta['freq']
+        self.df = pd.DataFrame({'Potencia_kW': valores}, index=idx, copy=False)
+        self._cubo = None; self._lock = threading.Lock()
+
+    @property
+    def cubo(self) -> CuboAgregado:
+        with self._lock:
+            if self._cubo is None: self._cubo = CuboAgregado.desde_serie(self.df['Potencia_kW'], self.horas_muestra)
+            return self._cubo
+
+    @property
+    def bytes_mapeados(self) -> int: return self.valores.nbytes + self.marcas.nbytes
+
+
+class Manejador:
+    """Referencia de una sesión a un dataset del almacén. No copia datos; `df` y `cubo` son compartidos."""
+
+    def __init__(self, almacen: 'AlmacenDatos', entrada: _Entrada):
+        self.clave = entrada.clave; self._entrada = entrada
+        self._fin = weakref.finalize(self, almacen._soltar, entrada.clave)
+
+    @property
+    def df(self) -> pd.DataFrame: return self._entrada.df
+
+    @property
+    def cubo(self) -> CuboAgregado: return self._entrada.cubo
+
+    def liberar(self): self._fin()
+
+
+class AlmacenDatos:
+    """Registro de datasets abiertos del proceso, indexado por clave de contenido; `directorio` es solo suyo."""
+
+    def __init__(self, directorio: str = DIRECTORIO_ALMACEN):
+        os.makedirs(directorio, exist_ok=True)
+        _limpiar_huerfanos(directorio)
+        self.directorio = tempfile.mkdtemp(prefix=f'{PREFIJO_PROCESO}{os.getpid()}-', dir=directorio)
+        self._entradas = {}; self._lock = threading.Lock()
+        self._fin = weakref.finalize(self, shutil.rmtree, self.directorio, True)  # también al salir del intérprete
+
+    def cerrar(self):
+        """Borra el subdirectorio del proceso (lo mismo ocurre al salir del intérprete)."""
+        self._fin()
+
+    def _rutas(self, clave: str) -> tuple:
+        base = os.path.join(self.directorio, clave)
+        return base + '.f32.npy', base + '.ts.npy', base + '.json'
+
+    def _guardar_atomico(self, ruta: str, escribir):
+        fd, tmp = tempfile.mkstemp(dir=self.directorio, suffix='.tmp'); os.close(fd)
+        try:
+            with open(tmp, 'wb') as f: escribir(f)
+            os.replace(tmp, ruta)
+        finally:
+            if os.path.exists(tmp): os.remove(tmp)
+
+    def _mapear(self, clave: str):
+        ruta_valores, ruta_marcas, ruta_meta = self._rutas(clave)
+        try:
+            with open(ruta_meta, encoding='utf-8') as f: meta = json.load(f)
+            return _Entrada(clave, np.load(ruta_valores, mmap_mode='r'), np.load(ruta_marcas, mmap_mode='r'), meta)
+        except (FileNotFoundError, OSError, ValueError): return None
+
+    def _abrir_bloqueado(self, clave: str):
+        entrada = self._entradas.get(clave)
+        if entrada is None: return None
+        entrada.refs += 1
+        return Manejador(self, entrada)
+
+    def abrir(self, clave: str):
+        """Manejador de un dataset registrado en este proceso y todavía en uso, o None."""
+        with self._lock: return self._abrir_bloqueado(clave)
+
+    def registrar(self, df: pd.DataFrame, clave: str = None) -> Manejador:
+        """Guarda la columna 'Potencia_kW' como float32 mapeado y devuelve un manejador; si la clave existe la reutiliza."""
+        clave = clave or huella_dataframe(df)
+        with self._lock:
+            manejador = self._abrir_bloqueado(clave)
+            if manejador is not None: return manejador
+            ruta_valores, ruta_marcas, ruta_meta = self._rutas(clave)
+            valores = df['Potencia_kW'].to_numpy(dtype=np.float32)
+            marcas = np.asarray(df.index.asi8, dtype=np.int64)
+            meta = {'nombre_indice': df.index.name, 'freq': df.index.freqstr, 'horas_muestra': horas_por_muestra(df.index),
+                    'tz': str(df.index.tz) if df.index.tz is not None else None}
+            self._guardar_atomico(ruta_valores, lambda f: np.save(f, valores))
+            self._guardar_atomico(ruta_marcas, lambda f: np.save(f, marcas))
+            self._guardar_atomico(ruta_meta, lambda f: f.write(json.dumps(meta).encode('utf-8')))
+            entrada = self._mapear(clave)
+            if entrada is None: raise OSError(f"No se pudo mapear el dataset {clave} en {self.directorio}.")
+            self._entradas[clave] = entrada
+            return self._abrir_bloqueado(clave)
+
+    def _soltar(self, clave: str):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None: return
+            entrada.refs -= 1
+            if entrada.refs > 0: return
+            del self._entradas[clave]
+            for ruta in self._rutas(clave):
+                try: os.remove(ruta)
+                except OSError: pass
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {'directorio': os.path.abspath(self.directorio), 'datasets': len(self._entradas),
+                    'sesiones': sum(e.refs for e in self._entradas.values()),
+                    'mb_mapeados': sum(e.bytes_mapeados for e in self._entradas.values()) / 1048576,
+                    'refs': {c[:12]: e.refs for c, e in self._entradas.items()}}
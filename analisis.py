@@ -0,0 +1,248 @@
+# analisis.py
+"""Cálculos del dashboard sobre un cubo agregado (hora x día x mes) en lugar de recorrer la serie completa."""
+from datetime import time
+import numpy as np
+import pandas as pd
+
+DIAS_ORDENADOS = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
+# Escenario -> (factor global, horas con recargo, factor del recargo)
+ESCENARIOS = {
+    "Normal": (1.0, (), 1.0),
+    "Verano / Seca": (1.20, range(14, 22), 1.15),
+    "Invierno / Lluvias": (1.10, range(18, 23), 1.10),
+    "Vacaciones": (0.60, (), 1.0),
+}
+ALFA_SKETCH = 0.01  # Error relativo máximo de los cuantiles del sketch.
+GAMMA_SKETCH = (1 + ALFA_SKETCH) / (1 - ALFA_SKETCH)
+MINIMO_SKETCH = 1e-9  # Valores con |x| <= a esto van a la cubeta de cero; los negativos usan claves de |x| en espejo.
+CLAVE_CERO = np.iinfo(np.int64).min
+HORAS_ANO = 8760  # año no bisiesto; el cubo guarda las horas de los años que cubren sus datos
+NS_HORA = 3_600_000_000_000
+
+
+def horas_por_muestra(idx: pd.DatetimeIndex) -> float:
+    """Duración de cada muestra en horas: la frecuencia del índice o, si no la tiene, la mediana de los pasos."""
+    if idx.freq is not None:
+        try: return pd.Timedelta(idx.freq).total_seconds() / 3600
+        except ValueError: pass
+    return float(np.median(np.diff(idx.asi8))) / NS_HORA if len(idx) > 1 else 1.0
+
+
+def claves_sketch(valores: np.ndarray) -> np.ndarray:
+    """Clave logarítmica de la magnitud de cada valor: ceil(log_gamma(|x|)); los casi cero reciben CLAVE_CERO.
+
+    El signo no entra en la clave: los negativos (p. ej. exportación de un medidor neto) van a un rango de
+    cubetas aparte con el mismo error relativo.
+    """
+    magnitudes = np.abs(np.asarray(valores, dtype='float64'))
+    claves = np.full(magnitudes.shape, CLAVE_CERO, dtype=np.int64)
+    con_clave = magnitudes > MINIMO_SKETCH
+    claves[con_clave] = np.ceil(np.log(magnitudes[con_clave]) / np.log(GAMMA_SKETCH)).astype(np.int64)
+    return claves
+
+
+def rango_claves(claves: np.ndarray) -> tuple:
+    """(clave mínima, número de cubetas) que cubren `claves`; (0, 0) si no hay ninguna."""
+    if not len(claves): return 0, 0
+    clave_min = int(claves.min())
+    return clave_min, int(claves.max()) - clave_min + 1
+
+
+def valor_de_clave(claves) -> np.ndarray:
+    """Valor representativo de cada cubeta (centro con error relativo <= ALFA_SKETCH)."""
+    return 2 * GAMMA_SKETCH ** np.asarray(claves, dtype='float64') / (GAMMA_SKETCH + 1)
+
+
+def factores_escenario(escenario: str) -> np.ndarray:
+    """Multiplicador por hora (24,) que aplica un escenario."""
+    base, horas, recargo = ESCENARIOS.get(escenario, ESCENARIOS["Normal"])
+    factores = np.full(24, base)
+    factores[list(horas)] *= recargo
+    return factores
+
+
+def horas_en_ventana(inicio: time, fin: time) -> np.ndarray:
+    """Máscara (24,) de las horas en punto que `between_time(inicio, fin)` incluye (admite ventanas que cruzan medianoche)."""
+    horas = np.array([time(h, 0) for h in range(24)])
+    if inicio <= fin: return (horas >= inicio) & (horas <= fin)
+    return (horas >= inicio) | (horas <= fin)
+
+
+def horas_rango_diurno(inicio: time, fin: time) -> np.ndarray:
+    """Máscara (24,) de las horas inicio.hour..fin.hour usadas para reescalar diurno/nocturno."""
+    return np.isin(np.arange(24), range(inicio.hour, fin.hour + 1))
+
+
+def _celdas(idx: pd.DatetimeIndex) -> np.ndarray:
+    return (idx.hour.to_numpy() * 7 + idx.dayofweek.to_numpy()) * 12 + (idx.month.to_numpy() - 1)
+
+
+class CuboAgregado:
+    """Sumas, cuentas, máximos y mínimos por (hora, día de semana, mes) y un sketch de valores por hora de una serie de potencia.
+
+    Se construye una vez por dataset; todas las vistas que dependen de escenario y reparto se derivan de él,
+    porque esos ajustes solo multiplican cada hora del día por un factor. Las muestras pueden ser sub-horarias:
+    `horas_muestra` convierte sumas de kW en kWh, `maximo` es el pico de demanda a la resolución nativa
+    (p. ej. 15 min) y `maximo_horario` el pico de la potencia media de cada hora de reloj. Las cubetas del sketch
+    son [cero, `n_pos` positivas desde `clave_min`, `n_neg` negativas desde `clave_min_neg`]. `horas_ano` es la
+    duración del año calendario de los datos (8784 h si es bisiesto; la media si abarcan varios años) y es la base
+    a la que se extrapola el consumo anual.
+    """
+
+    def __init__(self, suma, cuenta, maximo, minimo, sketch, clave_min: int, maximo_horario=None, horas_muestra: float = 1.0, clave_min_neg: int = 0, n_neg: int = 0, horas_ano: float = HORAS_ANO):
+        self.suma, self.cuenta, self.maximo, self.minimo = suma, cuenta, maximo, minimo
+        self.sketch, self.clave_min = sketch, clave_min
+        self.clave_min_neg, self.n_neg = clave_min_neg, n_neg
+        self.maximo_horario = maximo if maximo_horario is None else maximo_horario
+        self.horas_muestra, self.horas_ano = horas_muestra, horas_ano
+
+    @classmethod
+    def desde_serie(cls, serie: pd.Series, horas_muestra: float = None) -> 'CuboAgregado':
+        serie = serie.dropna()
+        valores = serie.to_numpy(dtype='float64'); idx = serie.index
+        if horas_muestra is None: horas_muestra = horas_por_muestra(idx)
+        celda = _celdas(idx)
+        suma = np.bincount(celda, weights=valores, minlength=2016).reshape(24, 7, 12)
+        cuenta = np.bincount(celda, minlength=2016).reshape(24, 7, 12)
+        maximo = np.full(2016, -np.inf); np.maximum.at(maximo, celda, valores); maximo = maximo.reshape(24, 7, 12)
+        minimo = np.full(2016, np.inf); np.minimum.at(minimo, celda, valores); minimo = minimo.reshape(24, 7, 12)
+        maximo_horario = maximo
+        if horas_muestra < 1 and len(valores):
+            # Potencia media por hora de reloj (sumas por hora absoluta) y su máximo por celda
+            hora = idx.asi8 // NS_HORA; hora = hora - hora.min()
+            suma_hh = np.bincount(hora, weights=valores); cuenta_hh = np.bincount(hora)
+            celda_hh = np.zeros(len(cuenta_hh), dtype=celda.dtype); celda_hh[hora] = celda  # todas las muestras de una hora comparten celda
+            con_datos = cuenta_hh > 0
+            maximo_horario = np.full(2016, -np.inf)
+            np.maximum.at(maximo_horario, celda_hh[con_datos], suma_hh[con_datos] / cuenta_hh[con_datos]); maximo_horario = maximo_horario.reshape(24, 7, 12)
+        claves = claves_sketch(valores); con_clave = claves != CLAVE_CERO
+        positivos = con_clave & (valores > 0); negativos = con_clave & (valores < 0)
+        clave_min, n_pos = rango_claves(claves[positivos]); clave_min_neg, n_neg = rango_claves(claves[negativos])
+        n_cubetas = 1 + n_pos + n_neg
+        cubeta = np.zeros(len(valores), dtype=np.int64)  # cubeta 0 = ceros
+        cubeta[positivos] = claves[positivos] - clave_min + 1; cubeta[negativos] = claves[negativos] - clave_min_neg + 1 + n_pos
+        # El sketch solo se usa por hora del día (la LDC escala cada hora por su factor): (24, K) y no (24, 7, 12, K)
+        sketch = np.bincount(idx.hour.to_numpy() * n_cubetas + cubeta, minlength=24 * n_cubetas).reshape(24, n_cubetas).astype(np.int32)
+        anos = np.unique(idx.year.to_numpy())
+        bisiestos = (anos % 4 == 0) & ((anos % 100 != 0) | (anos % 400 == 0))
+        horas_ano = HORAS_ANO + 24 * float(bisiestos.mean()) if len(anos) else HORAS_ANO
+        return cls(suma, cuenta, maximo, minimo, sketch, clave_min, maximo_horario, horas_muestra, clave_min_neg, n_neg, horas_ano)
+
+    @property
+    def suma_hora(self) -> np.ndarray: return self.suma.sum(axis=(1, 2))
+
+    @property
+    def cuenta_hora(self) -> np.ndarray: return self.cuenta.sum(axis=(1, 2))
+
+    @property
+    def maximo_hora(self) -> np.ndarray: return self.maximo.max(axis=(1, 2))
+
+    @property
+    def maximo_horario_hora(self) -> np.ndarray: return self.maximo_horario.max(axis=(1, 2))
+
+    @property
+    def minimo_hora(self) -> np.ndarray: return self.minimo.min(axis=(1, 2))
+
+    def valores_sketch(self) -> np.ndarray:
+        """Valor representativo de cada cubeta del sketch (la cubeta 0 vale 0; las negativas, el espejo de su clave)."""
+        n_pos = self.sketch.shape[-1] - 1 - self.n_neg
+        return np.concatenate([[0.0], valor_de_clave(np.arange(n_pos) + self.clave_min), -valor_de_clave(np.arange(self.n_neg) + self.clave_min_neg)])
+
+
+def factores_ajuste(cubo: CuboAgregado, escenario: str, porcentaje_diurno: float, inicio: time, fin: time) -> np.ndarray:
+    """Factor final por hora (24,) = escenario x reescalado diurno/nocturno, en forma cerrada sobre el cubo."""
+    f_esc = factores_escenario(escenario)
+    suma_h = cubo.suma_hora * f_esc
+    total_energia = suma_h.sum()
+    energia_diurna_actual = suma_h[horas_en_ventana(inicio, fin)].sum()
+    energia_nocturna_actual = total_energia - energia_diurna_actual
+    energia_diurna_deseada = total_energia * (porcentaje_diurno / 100.0)
+    energia_nocturna_deseada = total_energia * (1 - porcentaje_diurno / 100.0)
+    factor_escala_diurno = energia_diurna_deseada / energia_diurna_actual if energia_diurna_actual > 0 else 0
+    factor_escala_nocturno = energia_nocturna_deseada / energia_nocturna_actual if energia_nocturna_actual > 0 else 0
+    return f_esc * np.where(horas_rango_diurno(inicio, fin), factor_escala_diurno, factor_escala_nocturno)
+
+
+def calcular_escenario(cubo: CuboAgregado, escenario: str, porcentaje_diurno: float, inicio: time, fin: time) -> dict:
+    """Perfil diario, métricas y heatmap del escenario elegido, sin tocar la serie original."""
+    g = factores_ajuste(cubo, escenario, porcentaje_diurno, inicio, fin)
+    cuenta_h = cubo.cuenta_hora
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media_h = cubo.suma_hora * g / cuenta_h
+        cuenta_hd = cubo.cuenta.sum(axis=2)
+        heatmap = cubo.suma.sum(axis=2) * g[:, None] / cuenta_hd
+    horas = np.flatnonzero(cuenta_h > 0)
+    df_perfil_diario = pd.DataFrame({'Hora': horas, 'Potencia_kW': media_h[horas]})
+    # Energía = suma de kW x duración de la muestra; el consumo anual/mensual se extrapola por horas cubiertas a las
+    # horas del año de los datos, así un año bisiesto completo da su propio total
+    suma_kw = float((cubo.suma_hora * g).sum()); n = int(cuenta_h.sum())
+    total_kwh_anual = suma_kw * cubo.horas_muestra; consumo_anual_kwh = total_kwh_anual * cubo.horas_ano / (n * cubo.horas_muestra) if n else 0.0
+    pico_kw_diario = df_perfil_diario['Potencia_kW'].max(); media_kw_diaria = df_perfil_diario['Potencia_kW'].mean()
+    metrics_dashboard = {"pico_kw_diario": pico_kw_diario, "media_kw_diaria": media_kw_diaria, "consumo_mensual_kwh": consumo_anual_kwh / 12, "consumo_anual_kwh": consumo_anual_kwh}
+    pivot = pd.DataFrame(heatmap[horas], index=pd.Index(horas, name='Hora'), columns=pd.Index(DIAS_ORDENADOS, name='Día'))
+    return {
+        'factores': g, 'perfil_diario': df_perfil_diario, 'metrics_dashboard': metrics_dashboard, 'heatmap': pivot,
+        'total_kwh_anual': total_kwh_anual, 'pico_kw_anual': float((cubo.maximo_hora[horas] * g[horas]).max()) if n else 0.0,
+        'pico_kw_horario': float((cubo.maximo_horario_hora[horas] * g[horas]).max()) if n else 0.0,
+        'media_kw_anual': suma_kw / n if n else 0.0, 'intervalo_min': cubo.horas_muestra * 60,
+    }
+
+
+def ajustar_serie(df: pd.DataFrame, factores: np.ndarray) -> pd.DataFrame:
+    """Serie 'Potencia_kW' con los factores horarios aplicados (solo para exportar o graficar la serie completa)."""
+    return pd.DataFrame({'Potencia_kW': df['Potencia_kW'].to_numpy() * factores.astype(df['Potencia_kW'].dtype)[df.index.hour]}, index=df.index)
+
+
+def resumen_medidor(df: pd.DataFrame, escenario: str = "Normal", porcentaje_diurno: float = 50, inicio: time = time(6, 0), fin: time = time(18, 0)) -> dict:
+    """Fila plana con las métricas del dashboard, pico/media anual y el perfil diario ajustado (kw_h00..kw_h23).
+
+    Incluye además 'factores' (24,) para ajustar la serie completa con `ajustar_serie` si se necesita.
+    """
+    resultado = calcular_escenario(CuboAgregado.desde_serie(df['Potencia_kW']), escenario, porcentaje_diurno, inicio, fin)
+    fila = dict(resultado['metrics_dashboard'])
+    fila.update({k: resultado[k] for k in ('total_kwh_anual', 'pico_kw_anual', 'pico_kw_horario', 'media_kw_anual', 'intervalo_min')})
+    fila['horas'] = len(df) * resultado['intervalo_min'] / 60
+    perfil = resultado['perfil_diario'].set_index('Hora')['Potencia_kW']
+    fila.update({f'kw_h{h:02d}': float(perfil.get(h, np.nan)) for h in range(24)})
+    fila['factores'] = resultado['factores']
+    return fila
+
+
+VENTANAS_BARRIDO = [(time(6, 0), time(18, 0)), (time(7, 0), time(19, 0)), (time(8, 0), time(17, 0)), (time(5, 0), time(20, 0))]
+
+
+def barrido_escenarios(cubo: CuboAgregado, escenarios=None, repartos=None, ventanas=None) -> pd.DataFrame:
+    """Métricas de toda la rejilla escenario x reparto diurno x horario diurno en una pasada vectorizada.
+
+    Usa los totales por hora del cubo y difunde los factores a un arreglo (E, R, W, 24), en vez de repetir el
+    ajuste de la serie por combinación. Los resultados coinciden con `calcular_escenario` para cada punto.
+    """
+    escenarios = list(escenarios or ESCENARIOS); ventanas = list(ventanas or VENTANAS_BARRIDO)
+    repartos = np.asarray(range(0, 101, 5) if repartos is None else repartos, dtype='float64')
+    S, C, M, MH = cubo.suma_hora, cubo.cuenta_hora, cubo.maximo_hora, cubo.maximo_horario_hora
+    F = np.stack([factores_escenario(e) for e in escenarios])                       # (E, 24)
+    en_ventana = np.stack([horas_en_ventana(i, f) for i, f in ventanas])            # (W, 24)
+    en_rango = np.stack([horas_rango_diurno(i, f) for i, f in ventanas])            # (W, 24)
+    suma_esc = F * S; total = suma_esc.sum(axis=1)                                  # (E, 24), (E,)
+    diurna = suma_esc @ en_ventana.T; nocturna = total[:, None] - diurna            # (E, W)
+    deseada_d = total[:, None, None] * (repartos[None, :, None] / 100.0)            # (E, R, 1)
+    deseada_n = total[:, None, None] * (1 - repartos[None, :, None] / 100.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fd = np.where(diurna[:, None, :] > 0, deseada_d / diurna[:, None, :], 0.0)  # (E, R, W)
+        fn = np.where(nocturna[:, None, :] > 0, deseada_n / nocturna[:, None, :], 0.0)
+        media_h = S / C
+    g = F[:, None, None, :] * np.where(en_rango[None, None], fd[..., None], fn[..., None])  # (E, R, W, 24)
+    horas = C > 0
+    perfil = (g * media_h)[..., horas]
+    total_kwh = (g * S).sum(axis=-1) * cubo.horas_muestra
+    anual = total_kwh * cubo.horas_ano / (C.sum() * cubo.horas_muestra) if C.sum() else np.zeros_like(total_kwh)
+    E, R, W = g.shape[:3]
+    ie, ir, iw = (a.ravel() for a in np.meshgrid(np.arange(E), np.arange(R), np.arange(W), indexing='ij'))
+    return pd.DataFrame({
+        'Escenario': np.asarray(escenarios)[ie], 'Reparto Diurno (%)': repartos[ir],
+        'Horario Diurno': np.asarray([f"{i:%H:%M}-{f:%H:%M}" for i, f in ventanas])[iw],
+        'pico_kw_diario': perfil.max(axis=-1).ravel(), 'media_kw_diaria': perfil.mean(axis=-1).ravel(),
+        'consumo_mensual_kwh': (anual / 12).ravel(), 'consumo_anual_kwh': anual.ravel(),
+        'total_kwh_anual': total_kwh.ravel(), 'pico_kw_anual': (g * M)[..., horas].max(axis=-1).ravel(),
+        'pico_kw_horario': (g * MH)[..., horas].max(axis=-1).ravel(),
+    })
@@ -3,12 +3,24 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
-import plotly.graph_objects as go
 from datetime import time, date, datetime
+import hashlib
 import io
-from fpdf import FPDF
+import json
+import uuid
 from PIL import Image
 import streamlit.components.v1 as components # <-- Importante para embeber HTML
+from ingesta import leer_serie_por_bloques, leer_perfil_carga, detectar_formato, TIPO_SERIE, TIPO_PERFIL
+from cache_series import CacheSeries, hash_contenido
+from perfiles import generar_perfil, plantilla_desde_items, perfil_desde_factura, perfiles_desde_facturas, columnas_meses, PLANTILLAS_TIPICAS
+from analisis import ESCENARIOS, ALFA_SKETCH, VENTANAS_BARRIDO, calcular_escenario, ajustar_serie, barrido_escenarios
+from ldc import ldc_desde_cubo, ldc_exacta, PUNTOS_LDC
+from reportes import generar_reporte_pdf, generar_reporte_factura_pdf
+from graficos import CacheFiguras, figura_linea_perfil, figura_barras_perfil, figura_heatmap, figura_ldc
+from tarifas import BaseFacturacion, cargar_tarifas, facturar
+from almacen import AlmacenDatos
+from trabajos import GestorTrabajos, TERMINADO, ERROR
+from diagnostico import Instrumentacion
 
 # --- CONFIGURACIÓN DE LA PÁGINA Y ESTILOS ---
 st.set_page_config(
@@ -113,83 +125,124 @@ def load_css():
 load_css()
 
 # --- ESTADO DE LA SESIÓN ---
-if 'df_consumo' not in st.session_state: st.session_state.df_consumo = pd.DataFrame()
+if 'dataset' not in st.session_state: st.session_state.dataset = None  # Manejador del almacén compartido, nunca una copia del DataFrame
 if 'electrodomesticos' not in st.session_state: st.session_state.electrodomesticos = []
+if 'tarifas' not in st.session_state: st.session_state.tarifas = cargar_tarifas()
+if 'cargas_descartadas' not in st.session_state: st.session_state.cargas_descartadas = {}  # clave -> mensaje, para no relanzar
+if 'id_sesion' not in st.session_state: st.session_state.id_sesion = uuid.uuid4().hex[:8]
+# Instrumentación del rerun (casilla 🩺 del sidebar); apagada, cada etapa cuesta solo una llamada
+instr = Instrumentacion(st.session_state.get('diagnostico', False), st.session_state.id_sesion)
 
 # --- FUNCIONES AUXILIARES --- (Sin cambios)
-@st.cache_data
-def cargar_datos_masivos(uploaded_file):
-    try:
-        uploaded_file.seek(0)
-        df = pd.read_csv(uploaded_file) if uploaded_file.name.endswith('.csv') else pd.read_excel(uploaded_file)
-        df.columns = [col.lower().strip() for col in df.columns]
-        ts_col = next((c for c in ['timestamp', 'fecha', 'time', 'date'] if c in df.columns), None)
-        p_col = next((c for c in ['potencia_kw', 'kw', 'power_kw', 'potencia_w', 'w', 'consumo'] if c in df.columns), None)
-        if not ts_col or not p_col: return pd.DataFrame()
-        df['Timestamp'] = pd.to_datetime(df[ts_col], errors='coerce'); df.dropna(subset=['Timestamp'], inplace=True); df = df.set_index('Timestamp'); df['Potencia_kW'] = pd.to_numeric(df[p_col], errors='coerce')
-        if df['Potencia_kW'].median() > 1000: st.toast("W detectados -> kW.", icon="⚠️"); df['Potencia_kW'] /= 1000.0
-        df = df[['Potencia_kW']].sort_index(); df = df[~df.index.duplicated(keep='first')]; return df.asfreq('h', method='ffill')
-    except Exception as e: return pd.DataFrame()
-
-def generar_perfil_manual(items: list, year: int):
-    if not items: st.warning("No hay electrodomésticos."); return pd.DataFrame()
-    idx = pd.date_range(start=f'{year}-01-01 00:00', end=f'{year}-12-31 23:00', freq='h'); idx.name = 'Timestamp'
-    perfil = pd.DataFrame(0.0, index=idx, columns=['Potencia_kW'])
-    for item in items:
-        potencia_kw = (item['potencia_w'] * item['cantidad']) / 1000.0
-        dias_de_uso = list(range(item['dias_por_semana']))
-        horas_de_uso = item['horas_de_uso']
-        if not horas_de_uso: continue
-        filtro_dias = perfil.index.dayofweek.isin(dias_de_uso)
-        filtro_horas = perfil.index.hour.isin(horas_de_uso)
-        perfil.loc[filtro_dias & filtro_horas, 'Potencia_kW'] += potencia_kw
-    return perfil
-
-def cargar_perfil_desde_archivo(uploaded_file):
-    try:
-        uploaded_file.seek(0)
-        df_perfil = (pd.read_csv(uploaded_file, skiprows=7) if uploaded_file.name.endswith('.csv') else pd.read_excel(uploaded_file, skiprows=7))
-        df_perfil.columns = [str(col).strip().split('.')[0] for col in df_perfil.columns]
-        if 'Carga' not in df_perfil.columns or 'Potencia (W)' not in df_perfil.columns: return pd.DataFrame()
-        hourly_cols = [str(i) for i in range(24) if str(i) in df_perfil.columns]
-        items_manuales = []
-        for _, row in df_perfil.iterrows():
-            nombre = row['Carga']; potencia_w = pd.to_numeric(row['Potencia (W)'], errors='coerce')
-            if pd.isna(nombre) or pd.isna(potencia_w) or potencia_w == 0: continue
-            horas_de_uso = [int(h) for h in hourly_cols if pd.to_numeric(row[h], errors='coerce') == 1]
-            if horas_de_uso: items_manuales.append({"nombre": nombre, "cantidad": 1, "potencia_w": potencia_w, "dias_por_semana": 7, "horas_de_uso": horas_de_uso})
-        if not items_manuales: st.warning("Archivo leído, sin datos válidos."); return pd.DataFrame()
-        year_actual = date.today().year; df_generado = generar_perfil_manual(items_manuales, year_actual)
-        return df_generado
-    except Exception as e: return pd.DataFrame()
-
-def generar_reporte_pdf(metrics_diarios: dict, fig_perfil_diario: go.Figure) -> bytes:
-    pdf = FPDF()
-    pdf.add_page(); pdf.set_font("Arial", 'B', 16); pdf.cell(0, 10, "Reporte Perfil Consumo Diario", 0, 1, 'C')
-    pdf.set_font("Arial", '', 10); pdf.cell(0, 8, f"Generado: {date.today().strftime('%d/%m/%Y')}", 0, 1, 'C'); pdf.ln(10)
-    pdf.set_font("Arial", 'B', 12); pdf.cell(0, 10, "Métricas Clave (Diarias)", 0, 1, 'L'); pdf.set_font("Arial", '', 11)
-    pdf.cell(95, 8, "Pico Potencia:", 1, 0, 'L'); pdf.cell(95, 8, f"{metrics_diarios['pico_kw_diario']:.2f} kW", 1, 1, 'R')
-    pdf.cell(95, 8, "Prom. Potencia:", 1, 0, 'L'); pdf.cell(95, 8, f"{metrics_diarios['media_kw_diaria']:.2f} kW", 1, 1, 'R')
-    pdf.cell(95, 8, "Consumo Mensual Est.:", 1, 0, 'L'); pdf.cell(95, 8, f"{metrics_diarios['consumo_mensual_kwh']:,.0f} kWh", 1, 1, 'R')
-    pdf.cell(95, 8, "Consumo Anual Est.:", 1, 0, 'L'); pdf.cell(95, 8, f"{metrics_diarios['consumo_anual_kwh']:,.0f} kWh", 1, 1, 'R'); pdf.ln(5)
-    curva_bytes = io.BytesIO(fig_perfil_diario.to_image(format="png", width=800, height=400, scale=2))
-    pdf.add_page(); pdf.set_font("Arial", 'B', 14); pdf.cell(0, 10, "Perfil Consumo Diario Promedio", 0, 1, 'C'); pdf.ln(5); pdf.image(curva_bytes, x=10, w=pdf.w - 20)
-    return bytes(pdf.output())
-
-def generar_reporte_factura_pdf(metrics: dict, df_factura: pd.DataFrame, fig_factura: go.Figure) -> bytes:
-    pdf = FPDF()
-    pdf.add_page(); pdf.set_font("Arial", 'B', 16); pdf.cell(0, 10, "Reporte Consumo Factura", 0, 1, 'C')
-    pdf.set_font("Arial", '', 10); pdf.cell(0, 8, f"Generado: {date.today().strftime('%d/%m/%Y')}", 0, 1, 'C'); pdf.ln(10)
-    pdf.set_font("Arial", 'B', 12); pdf.cell(0, 10, "Resumen Anual", 0, 1, 'L'); pdf.set_font("Arial", '', 11)
-    pdf.cell(95, 8, "Total Anual:", 1, 0, 'L'); pdf.cell(95, 8, f"{metrics['total_anual']:.1f} kWh", 1, 1, 'R')
-    pdf.cell(95, 8, "Prom. Mensual:", 1, 0, 'L'); pdf.cell(95, 8, f"{metrics['promedio_mensual']:.1f} kWh", 1, 1, 'R'); pdf.ln(5)
-    pdf.set_font("Arial", 'B', 12); pdf.cell(0, 10, "Detalle Mensual", 0, 1, 'L'); pdf.set_font("Arial", 'B', 10)
-    pdf.cell(95, 8, "Mes", 1, 0, 'C'); pdf.cell(95, 8, "Consumo (kWh)", 1, 1, 'C')
-    pdf.set_font("Arial", '', 10)
-    for _, row in df_factura.iterrows(): pdf.cell(95, 8, row['Mes'], 1, 0, 'L'); pdf.cell(95, 8, f"{row['Consumo (kWh)']:.1f}", 1, 1, 'R')
-    factura_bytes = io.BytesIO(fig_factura.to_image(format="png", width=800, height=500, scale=2))
-    pdf.add_page(); pdf.set_font("Arial", 'B', 14); pdf.cell(0, 10, "Consumo Anual por Mes", 0, 1, 'C'); pdf.ln(5); pdf.image(factura_bytes, x=10, w=pdf.w - 20)
-    return bytes(pdf.output())
+@st.cache_resource
+def obtener_cache_series() -> CacheSeries:
+    return CacheSeries()
+
+@st.cache_resource
+def obtener_cache_figuras() -> CacheFiguras:
+    return CacheFiguras()
+
+@st.cache_resource
+def obtener_almacen() -> AlmacenDatos:
+    return AlmacenDatos()
+
+@st.cache_resource
+def obtener_trabajos() -> GestorTrabajos:
+    return GestorTrabajos()
+
+def fijar_dataset(manejador):
+    """Sustituye el dataset de la sesión y suelta la referencia al anterior."""
+    anterior = st.session_state.dataset; st.session_state.dataset = manejador
+    if anterior is not None and anterior is not manejador: anterior.liberar()
+
+def hash_archivo(uploaded_file) -> str:
+    """Hash del contenido, memorizado por archivo subido para no releerlo en cada rerun."""
+    hashes = st.session_state.setdefault('hashes_archivos', {})
+    if uploaded_file.file_id not in hashes: hashes[uploaded_file.file_id] = hash_contenido(uploaded_file)
+    return hashes[uploaded_file.file_id]
+
+def deteccion_archivo(uploaded_file):
+    """Formato detectado, memorizado por archivo subido: en XLSX abrir el libro cuesta en cada rerun."""
+    detecciones = st.session_state.setdefault('detecciones_archivos', {})
+    if uploaded_file.file_id not in detecciones: detecciones[uploaded_file.file_id] = detectar_formato(uploaded_file, uploaded_file.name)
+    return detecciones[uploaded_file.file_id]
+
+def clave_archivo(uploaded_file, deteccion) -> str:
+    clave = f"{deteccion.tipo}-{hash_archivo(uploaded_file)}"
+    if deteccion.tipo == TIPO_PERFIL: clave += f"-{deteccion.fila_encabezado}-{date.today().year}"
+    return clave
+
+def clave_de(*partes) -> str:
+    return hashlib.blake2b(json.dumps(partes, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+# Trabajos de fondo: corren en el pool compartido, sin llamadas a st.*; devuelven (manejador, aviso).
+def ingerir_archivo(datos: bytes, nombre: str, deteccion, clave: str, cache: CacheSeries, almacen: AlmacenDatos, progreso=None):
+    """Parsea (o lee de la caché en disco) y registra el dataset en el almacén compartido."""
+    df = cache.obtener(clave)
+    if df is None:
+        fuente = io.BytesIO(datos)
+        if deteccion.tipo == TIPO_SERIE: df = leer_serie_por_bloques(fuente, nombre, progreso=progreso)
+        else: df = leer_perfil_carga(fuente, nombre, deteccion.fila_encabezado, date.today().year)
+        cache.guardar(clave, df)
+    return almacen.registrar(df, clave), ("W detectados -> kW." if df.attrs.get('convertido_w') else None)
+
+def generar_perfil_manual(items: list, year: int, almacen: AlmacenDatos, progreso=None):
+    return almacen.registrar(generar_perfil(items, year)), None
+
+def perfiles_facturas_lote(tabla: pd.DataFrame, year: int, plantilla: str, progreso=None):
+    """Perfiles de toda la tabla en una pasada, más un Parquet para descargarlos."""
+    df = perfiles_desde_facturas(tabla, year, plantilla); salida = io.BytesIO()
+    df.to_parquet(salida, engine='pyarrow', compression='zstd')
+    return df, salida.getvalue()
+
+def iniciar_carga(clave: str, funcion, *args, descripcion: str = '', mensaje_ok: str = "✅ Datos cargados!"):
+    """Lanza (o se une a) el trabajo de esa clave y lo asocia a la sesión para seguir su avance."""
+    st.session_state.trabajo_carga = obtener_trabajos().enviar(clave, funcion, *args, descripcion=descripcion, sesion=st.session_state.id_sesion)
+    st.session_state.mensaje_carga = mensaje_ok
+
+@st.fragment(run_every=1.0)
+def seguir_trabajo(trabajo, etiqueta: str):
+    """Avance del trabajo sin bloquear el resto de la app; al terminar (o al cancelarlo esta sesión) relanza la app completa una vez."""
+    if trabajo.activo and trabajo.suscrito(st.session_state.id_sesion):
+        texto = f"{etiqueta}: " + (f"{trabajo.filas:,} filas · {trabajo.bloques} bloques · " if trabajo.bloques else "") + f"{trabajo.segundos:.1f} s"
+        st.progress(trabajo.fraccion or 0.0, text=texto)
+        # Solo retira a esta sesión: si otra subió el mismo archivo, su trabajo sigue. Se marca descartado para no relanzarlo en el rerun
+        if trabajo.cancelable and st.button("✖️ Cancelar", key=f"cancelar_{trabajo.clave}"):
+            trabajo.cancelar(st.session_state.id_sesion); st.session_state.cargas_descartadas[trabajo.clave] = f"{etiqueta}: cancelado."; st.rerun()
+    else: st.rerun()
+
+def trabajo_descartado(clave: str) -> bool:
+    """Si esta sesión canceló (o vio fallar) el trabajo `clave`, muestra el motivo y un botón para reintentarlo en lugar de relanzarlo."""
+    if clave not in st.session_state.cargas_descartadas: return False
+    st.error(st.session_state.cargas_descartadas[clave])
+    st.button("🔁 Reintentar", key=f"reintentar_{clave}", on_click=st.session_state.cargas_descartadas.pop, args=(clave, None))
+    return True
+
+def adoptar_carga():
+    """Si el trabajo de carga de la sesión acabó, toma su dataset (o informa el error) y lo olvida.
+
+    Se llama una vez por rerun en cualquier página: la carga sigue aunque el cargador de archivos no se muestre.
+    """
+    global carga_atendida
+    trabajo = st.session_state.get('trabajo_carga')
+    if carga_atendida or trabajo is None: return
+    carga_atendida = True; suscrito = trabajo.suscrito(st.session_state.id_sesion)
+    if trabajo.activo and suscrito: seguir_trabajo(trabajo, trabajo.descripcion); return
+    del st.session_state['trabajo_carga']
+    instr.registrar(f"trabajo:{trabajo.descripcion}", trabajo.segundos, trabajo.filas or None, error=type(trabajo.error).__name__ if trabajo.error else None)
+    ultima = obtener_trabajos().retirar(trabajo, st.session_state.id_sesion)
+    if trabajo.estado == TERMINADO and suscrito:
+        manejador, aviso = trabajo.resultado
+        fijar_dataset(obtener_almacen().abrir(manejador.clave)); st.success(st.session_state.get('mensaje_carga', "✅ Datos cargados!"))
+        if aviso: st.toast(aviso, icon="⚠️")
+    else:
+        mensaje = f"Error: Archivo rechazado. {trabajo.error}" if trabajo.estado == ERROR and suscrito else "Carga cancelada. Pulsa Reintentar o vuelve a subir el archivo."
+        # Si la canceló esta sesión desde la barra de avance ya quedó descartada (y avisada) al pulsar Cancelar
+        if trabajo.clave not in st.session_state.cargas_descartadas: st.session_state.cargas_descartadas[trabajo.clave] = mensaje; st.error(mensaje)
+    # El manejador del resultado sostiene el dataset hasta que lo abre la última sesión que seguía el trabajo
+    if ultima and trabajo.estado == TERMINADO: trabajo.resultado[0].liberar()
+
+carga_atendida = False  # adoptar_carga ya corrió en este rerun (en la página de carga o en el sidebar)
 
 # --- INTERFAZ DE USUARIO ---
 try:
@@ -200,17 +253,15 @@ except FileNotFoundError:
     st.title("⚡ Analizador de Consumo"); st.caption("Visualiza y entiende tus patrones de consumo eléctrico.")
 
 # --- PESTAÑAS (SIN CHATBOT) ---
-tab_carga, tab_dashboard, tab_ldc, tab_exportar = st.tabs([
-    "📂 Ingreso Datos",
-    "📊 Dashboard",
-    "⚡ LDC Diario",
-    "📤 Exportar"
-])
+# Navegación por radio: solo se ejecuta la pestaña visible, así las figuras de las demás no se construyen.
+PESTANAS = ["📂 Ingreso Datos", "📊 Dashboard", "⚡ LDC Diario", "📤 Exportar"]
+pestana = st.radio("Sección", PESTANAS, horizontal=True, key="pestana", label_visibility="collapsed")
+tab_carga, tab_dashboard, tab_ldc, tab_exportar = [st.container() for _ in PESTANAS]
 
 
 # --- PESTAÑA CARGA DE DATOS ---
 # (ESTE BLOQUE AHORA VA PRIMERO, ANTES DEL SIDEBAR)
-with st.container(border=True):
+if pestana == PESTANAS[0]:
     with tab_carga:
         st.header("Paso 1: Ingresa tus datos")
         modo_carga = st.radio("Elige método:", ("Cargar Archivo", "Ingreso Manual", "Factura Mensual"), horizontal=True, label_visibility="collapsed")
@@ -220,13 +271,23 @@ with st.container(border=True):
             st.markdown("Sube **series de tiempo** o **perfil de carga**.")
             archivo = st.file_uploader("Sube archivo", type=['csv', 'xlsx'], label_visibility="collapsed")
             if archivo:
-                with st.spinner("Procesando..."):
-                    df_cargado_ts = cargar_datos_masivos(archivo)
-                    if not df_cargado_ts.empty: st.session_state.df_consumo = df_cargado_ts; st.success(f"✅ Series de tiempo cargadas!")
-                    else:
-                        df_cargado_perfil = cargar_perfil_desde_archivo(archivo)
-                        if not df_cargado_perfil.empty: st.session_state.df_consumo = df_cargado_perfil; st.success(f"✅ Perfil de carga procesado!")
-                        else: st.error("Error: Archivo no coincide.")
+                # El parseo corre en segundo plano (deduplicado por hash): los reruns solo consultan su avance.
+                with st.spinner("Procesando..."), instr.etapa('detectar_formato'): deteccion = deteccion_archivo(archivo)
+                mensaje_ok = "✅ Series de tiempo cargadas!" if deteccion.tipo == TIPO_SERIE else "✅ Perfil de carga procesado!"
+                if deteccion.tipo in (TIPO_SERIE, TIPO_PERFIL):
+                    clave = clave_archivo(archivo, deteccion); actual = st.session_state.dataset
+                    # Una subida nueva (otro file_id) vuelve a intentar aunque el mismo contenido haya fallado o se haya cancelado
+                    if st.session_state.get('archivo_id') != archivo.file_id: st.session_state.archivo_id = archivo.file_id; st.session_state.cargas_descartadas.pop(clave, None)
+                    if trabajo_descartado(clave): pass
+                    elif actual is not None and actual.clave == clave: st.success(mensaje_ok)
+                    elif 'trabajo_carga' not in st.session_state or st.session_state.trabajo_carga.clave != clave:
+                        manejador = obtener_almacen().abrir(clave)
+                        if manejador is not None: fijar_dataset(manejador); st.success(mensaje_ok)
+                        else: iniciar_carga(clave, ingerir_archivo, archivo.getvalue(), archivo.name, deteccion, clave, obtener_cache_series(), obtener_almacen(), descripcion=f"Leyendo {archivo.name}", mensaje_ok=mensaje_ok)
+                    adoptar_carga()
+                else: st.error(f"Error: Archivo no coincide. {deteccion.motivo}")
+            with st.expander("🗄️ Caché de archivos"):
+                st.json({'cache': obtener_cache_series().estadisticas(), 'almacen': obtener_almacen().estadisticas(), 'trabajos': obtener_trabajos().estadisticas()})
 
         elif modo_carga == "Ingreso Manual":
             st.subheader("✍️ Perfil Manual"); st.markdown("Añade electrodomésticos.")
@@ -266,11 +327,17 @@ with st.container(border=True):
                 st.subheader("🚀 Generar Perfil"); year_manual = st.number_input("Año", 2020, date.today().year + 1, date.today().year)
                 # MODIFICADO: Reemplazado use_container_width=True con width='stretch'
                 if st.button("⚡ Generar", type="primary"):
-                    with st.spinner("Calculando..."): df_generado = generar_perfil_manual(st.session_state.electrodomesticos, year_manual)
-                    if not df_generado.empty: st.session_state.df_consumo = df_generado; st.success(f"✅ ¡Perfil generado!")
+                    items = [dict(item) for item in st.session_state.electrodomesticos]
+                    iniciar_carga(f"manual-{clave_de(items, year_manual)}", generar_perfil_manual, items, year_manual, obtener_almacen(), descripcion="Generando perfil", mensaje_ok="✅ ¡Perfil generado!")
+                adoptar_carga()
 
         elif modo_carga == "Factura Mensual":
             st.subheader("🧾 Desde Factura"); st.markdown("Ingresa kWh mensual.")
+            # Los 12 kWh se reparten hora a hora con una forma semanal (7 x 24) y generan la serie del Dashboard
+            opciones_forma = list(PLANTILLAS_TIPICAS) + (["Inventario manual"] if st.session_state.electrodomesticos else [])
+            col_forma, col_year = st.columns(2)
+            forma_factura = col_forma.selectbox("Forma de carga", opciones_forma, key="forma_factura", help="Forma semanal típica usada para repartir cada mes por hora. 'Inventario manual' usa los aparatos del Ingreso Manual.")
+            year_factura = col_year.number_input("Año", 2020, date.today().year + 1, date.today().year, key="year_factura")
             with st.form("factura_form"):
                 MESES = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]; consumos = {}; cols = st.columns(4)
                 for i, mes in enumerate(MESES):
@@ -283,16 +350,44 @@ with st.container(border=True):
                 else:
                     total_anual = sum(consumos_validos.values()); promedio_mensual = np.mean(list(consumos_validos.values())); st.markdown("---"); st.subheader("📊 Resumen Anual")
                     c1, c2 = st.columns(2); c1.metric("⚡ Total Anual", f"{total_anual:,.1f} kWh"); c2.metric("↔️ Prom. Mensual", f"{promedio_mensual:,.1f} kWh", help=f"Promedio {len(consumos_validos)} meses.")
+                    forma = plantilla_desde_items(st.session_state.electrodomesticos) if forma_factura == "Inventario manual" else forma_factura
+                    kwh_meses = [v if v > 0 else np.nan for v in consumos.values()]  # meses en 0 = sin dato, se rellenan con la media
+                    fijar_dataset(obtener_almacen().registrar(perfil_desde_factura(kwh_meses, year_factura, forma)))
+                    st.success("✅ Perfil horario generado desde la factura. Ve a Dashboard, LDC o Exportar.")
                     df_factura = pd.DataFrame(consumos.items(), columns=["Mes", "kWh"]); df_sorted = df_factura.sort_values(by="kWh", ascending=False)
                     st.markdown("**Consumo Mensual**")
                     fig_factura = px.bar(df_sorted, x="Mes", y="kWh", title="Consumo Mensual", text_auto='.1f'); fig_factura.update_traces(textposition='outside'); fig_factura.update_layout(title_x=0.5, template="plotly_dark", yaxis_title="kWh"); st.plotly_chart(fig_factura, use_container_width=True)
                     st.subheader("📄 Exportar")
                     try:
                         factura_metrics = {'total_anual': total_anual, 'promedio_mensual': promedio_mensual}
-                        pdf_data = generar_reporte_factura_pdf(factura_metrics, df_sorted.rename(columns={'kWh': 'Consumo (kWh)'}), fig_factura)
+                        pdf_data = generar_reporte_factura_pdf(factura_metrics, df_sorted.rename(columns={'kWh': 'Consumo (kWh)'}))
                         # MODIFICADO: Reemplazado use_container_width=True con width='stretch'
                         st.download_button("📥 PDF Factura", pdf_data, "reporte_factura.pdf", "application/pdf")
-                    except Exception as e: st.warning(f"PDF requiere 'kaleido'. Error: {e}")
+                    except Exception as e: st.warning(f"No se pudo generar el PDF. Error: {e}")
+            st.markdown("---"); st.subheader("👥 Facturas de Varios Clientes")
+            st.markdown("Sube una tabla (CSV/XLSX) con `cliente`, los meses `Ene`..`Dic` (o `1`..`12`) y, opcional, `plantilla` por cliente.")
+            archivo_facturas = st.file_uploader("Tabla de facturas", type=['csv', 'xlsx'], key="archivo_facturas", label_visibility="collapsed")
+            if archivo_facturas:
+                try:
+                    tabla_facturas = pd.read_csv(archivo_facturas) if archivo_facturas.name.lower().endswith('.csv') else pd.read_excel(archivo_facturas)
+                    columnas_meses(tabla_facturas)
+                except ValueError as e: st.error(f"Error: Tabla rechazada. {e}")
+                else:
+                    forma_lote = forma_factura if forma_factura in PLANTILLAS_TIPICAS else "Residencial"
+                    clave_lote = f"facturas-{hash_archivo(archivo_facturas)}-{forma_lote}-{year_factura}"
+                    trabajo_lote = None if trabajo_descartado(clave_lote) else obtener_trabajos().enviar(clave_lote, perfiles_facturas_lote, tabla_facturas, year_factura, forma_lote, descripcion="Perfiles desde facturas", sesion=st.session_state.id_sesion)
+                    if trabajo_lote is None: pass
+                    elif trabajo_lote.activo: seguir_trabajo(trabajo_lote, "Generando perfiles")
+                    elif trabajo_lote.estado != TERMINADO: st.error(f"Error: Tabla rechazada. {trabajo_lote.error}")
+                    else:
+                        df_clientes, parquet_clientes = trabajo_lote.resultado
+                        st.dataframe(pd.DataFrame({'Cliente': df_clientes.columns, 'Consumo Anual (kWh)': df_clientes.sum().to_numpy(), 'Pico (kW)': df_clientes.max().to_numpy()}), use_container_width=True, hide_index=True)
+                        col_cli, col_btn = st.columns([2, 1])
+                        cliente = col_cli.selectbox("Cliente", list(df_clientes.columns), key="cliente_factura")
+                        if col_btn.button("📊 Usar en Dashboard", type="primary"):
+                            fijar_dataset(obtener_almacen().registrar(df_clientes[[cliente]].rename(columns={cliente: 'Potencia_kW'})))
+                            st.success(f"✅ Perfil de {cliente} cargado.")
+                        st.download_button("📥 Descargar Perfiles (Parquet)", parquet_clientes, "perfiles_facturas.parquet", "application/octet-stream")
 
 
 # --- INICIALIZACIÓN DE VARIABLES PARA SIDEBAR ---
@@ -303,6 +398,8 @@ porcentaje_diurno_val = 50
 
 # --- SIDEBAR (CON CHATBOT Y FILTROS) ---
 with st.sidebar:
+    # Carga en curso lanzada desde 'Ingreso Datos': se sigue y se adopta aunque el usuario esté en otra página
+    adoptar_carga()
     st.header("🤖 Miguelito")
     try:
         image_bot = Image.open("macro/bot.png")
@@ -329,7 +426,7 @@ with st.sidebar:
     st.markdown("---")
     st.header("⚙️ Filtros y Ajustes")
 
-    if not st.session_state.df_consumo.empty:
+    if st.session_state.dataset is not None:
          with st.expander("Filtros Análisis", expanded=True):
              hora_diurna_inicio_val, hora_diurna_fin_val = st.slider(
                  "Define horario diurno", time(0, 0), time(23, 59), (hora_diurna_inicio_val, hora_diurna_fin_val),
@@ -337,7 +434,7 @@ with st.sidebar:
                  help="Define cómo se calculan métricas y gráficos 'Diurnos' y 'Nocturnos'."
              )
          with st.expander("🛠️ Ajustes Perfil", expanded=False):
-             st.caption("Simula escenarios."); escenario_val = st.selectbox("Escenario", ["Normal", "Verano / Seca", "Invierno / Lluvias", "Vacaciones"], key="select_escenario");
+             st.caption("Simula escenarios."); escenario_val = st.selectbox("Escenario", list(ESCENARIOS), key="select_escenario");
              porcentaje_diurno_val = st.slider("Reparto Diurno (%)", 0, 100, porcentaje_diurno_val, key="slider_reparto", help="% del consumo en horario diurno.");
     else:
         st.info("Carga datos para ver filtros.")
@@ -349,93 +446,103 @@ with st.sidebar:
 
 
 # --- BLOQUE PRINCIPAL DE VISUALIZACIÓN Y CÁLCULOS ---
-if not st.session_state.df_consumo.empty:
-    df_consumo = st.session_state.df_consumo
+if st.session_state.dataset is not None:
+    # DataFrame y cubo compartidos por todas las sesiones del mismo dataset (solo lectura, sin copias por rerun)
+    with instr.etapa('cubo', len(st.session_state.dataset.df)): df_consumo = st.session_state.dataset.df; cubo = st.session_state.dataset.cubo
 
     # --- Aplicar Ajustes (Usar valores de sidebar) ---
-    df_ajustado = df_consumo.copy()
-    if escenario == "Verano / Seca": df_ajustado['Potencia_kW'] *= 1.20; df_ajustado.loc[df_ajustado.index.hour.isin(range(14, 22)), 'Potencia_kW'] *= 1.15
-    elif escenario == "Invierno / Lluvias": df_ajustado['Potencia_kW'] *= 1.10; df_ajustado.loc[df_ajustado.index.hour.isin(range(18, 23)), 'Potencia_kW'] *= 1.10
-    elif escenario == "Vacaciones": df_ajustado['Potencia_kW'] *= 0.60
-
-    total_energia = df_ajustado['Potencia_kW'].sum();
-    energia_diurna_actual = df_ajustado.between_time(hora_diurna_inicio, hora_diurna_fin)['Potencia_kW'].sum();
-    energia_nocturna_actual = total_energia - energia_diurna_actual
-    energia_diurna_deseada = total_energia * (porcentaje_diurno / 100.0);
-    energia_nocturna_deseada = total_energia * (1 - porcentaje_diurno / 100.0)
-    factor_escala_diurno = energia_diurna_deseada / energia_diurna_actual if energia_diurna_actual > 0 else 0;
-    factor_escala_nocturno = energia_nocturna_deseada / energia_nocturna_actual if energia_nocturna_actual > 0 else 0
-    df_ajustado.loc[df_ajustado.index.hour.isin(range(hora_diurna_inicio.hour, hora_diurna_fin.hour + 1)), 'Potencia_kW'] *= factor_escala_diurno
-    df_ajustado.loc[~df_ajustado.index.hour.isin(range(hora_diurna_inicio.hour, hora_diurna_fin.hour + 1)), 'Potencia_kW'] *= factor_escala_nocturno
+    # El cubo se calcula una vez por dataset; los ajustes del sidebar se derivan de él en forma cerrada.
+    with instr.etapa('escenario_heatmap', len(df_consumo)): resultado = calcular_escenario(cubo, escenario, porcentaje_diurno, hora_diurna_inicio, hora_diurna_fin)
 
     # --- Cálculos ---
-    df_perfil_diario = df_ajustado.groupby(df_ajustado.index.hour)['Potencia_kW'].mean()
-    df_perfil_diario.index.name = 'Hora'; df_perfil_diario = df_perfil_diario.reset_index()
-    total_kwh_diario = df_perfil_diario['Potencia_kW'].sum(); pico_kw_diario = df_perfil_diario['Potencia_kW'].max(); media_kw_diaria = df_perfil_diario['Potencia_kW'].mean()
-    consumo_mensual_kwh = total_kwh_diario * 30; consumo_anual_kwh = total_kwh_diario * 365
-    metrics_dashboard = {"pico_kw_diario": pico_kw_diario, "media_kw_diaria": media_kw_diaria, "consumo_mensual_kwh": consumo_mensual_kwh, "consumo_anual_kwh": consumo_anual_kwh}
-    total_kwh_anual = df_ajustado['Potencia_kW'].sum(); pico_kw_anual = df_ajustado['Potencia_kW'].max(); media_kw_anual = df_ajustado['Potencia_kW'].mean()
-
-    # --- Gráficos ---
+    df_perfil_diario = resultado['perfil_diario']; metrics_dashboard = resultado['metrics_dashboard']
+    total_kwh_anual = resultado['total_kwh_anual']; pico_kw_anual = resultado['pico_kw_anual']; media_kw_anual = resultado['media_kw_anual']
+    # Todas las tarifas se facturan juntas sobre la serie ajustada (energía por mes y ranura semanal + pico mensual del cubo)
+    with instr.etapa('tarifas', len(st.session_state.tarifas)): df_tarifas, df_tarifas_mes = facturar(BaseFacturacion.desde_cubo(cubo, resultado['factores']), st.session_state.tarifas)
+
+    # --- Gráficos (se construyen al renderizar su pestaña y se reutilizan por parámetros) ---
     horas_diurnas_list = list(range(hora_diurna_inicio.hour, hora_diurna_fin.hour + 1))
-    df_diurno_graf = df_perfil_diario[df_perfil_diario['Hora'].isin(horas_diurnas_list)]; df_nocturno_graf = df_perfil_diario[~df_perfil_diario['Hora'].isin(horas_diurnas_list)]
-    fig_diurno = px.line(df_diurno_graf, x='Hora', y='Potencia_kW', title="Perfil Diurno", markers=True, labels={'Hora': 'Hora', 'Potencia_kW': 'kW'}); fig_diurno.update_layout(title_x=0.5, template="plotly_dark")
-    fig_nocturno = px.line(df_nocturno_graf, x='Hora', y='Potencia_kW', title="Perfil Nocturno", markers=True, labels={'Hora': 'Hora', 'Potencia_kW': 'kW'}); fig_nocturno.update_layout(title_x=0.5, template="plotly_dark")
-    fig_curva = px.line(df_perfil_diario, x='Hora', y='Potencia_kW', title="Perfil Diario (Línea)", markers=True, labels={'Hora': 'Hora', 'Potencia_kW': 'kW'}); fig_curva.update_layout(title_x=0.5, template="plotly_dark")
-    fig_barras_diario = px.bar(df_perfil_diario, x='Hora', y='Potencia_kW', title="Perfil Diario (Barras)", labels={'Hora': 'Hora', 'Potencia_kW': 'kW'}); fig_barras_diario.update_layout(title_x=0.5, template="plotly_dark")
-    df_heatmap_data = df_ajustado.copy(); df_heatmap_data['Hora'] = df_heatmap_data.index.hour
-    dias_map = {0: 'Lun', 1: 'Mar', 2: 'Mié', 3: 'Jue', 4: 'Vie', 5: 'Sáb', 6: 'Dom'}; df_heatmap_data['Día'] = df_heatmap_data.index.dayofweek.map(dias_map)
-    dias_ordenados = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']; pivot = pd.pivot_table(df_heatmap_data, values='Potencia_kW', index='Hora', columns='Día', aggfunc='mean').reindex(columns=dias_ordenados)
-    fig_heatmap = px.imshow(pivot, labels=dict(x="Día", y="Hora", color="kW"), color_continuous_scale='YlOrRd', aspect='auto'); fig_heatmap.update_yaxes(autorange='reversed'); fig_heatmap.update_layout(title_x=0.5, template="plotly_dark", title="Heatmap Semanal Prom.")
-    s_sorted_anual = df_ajustado['Potencia_kW'].sort_values(ascending=False).reset_index(drop=True); pct_tiempo_anual = (np.arange(1, len(s_sorted_anual) + 1) / len(s_sorted_anual)) * 100
-    df_ldc_anual = pd.DataFrame({'Potencia_kW': s_sorted_anual, 'Porcentaje_Tiempo': pct_tiempo_anual}); fig_ldc_anual = px.area(df_ldc_anual, x='Porcentaje_Tiempo', y='Potencia_kW', title="LDC Anual", labels={'Porcentaje_Tiempo': '% Horas Año', 'Potencia_kW': 'kW'}); fig_ldc_anual.add_hline(y=pico_kw_anual, line_dash="dot", annotation_text=f"Pico: {pico_kw_anual:.2f} kW"); fig_ldc_anual.add_hline(y=media_kw_anual, line_dash="dash", annotation_text=f"Prom: {media_kw_anual:.2f} kW", line_color="#2ECC71"); fig_ldc_anual.update_layout(title_x=0.5, template="plotly_dark")
-    s_sorted_diario = df_perfil_diario['Potencia_kW'].sort_values(ascending=False).reset_index(drop=True); pct_tiempo_diario = (np.arange(1, len(s_sorted_diario) + 1) / len(s_sorted_diario)) * 100
-    df_ldc_diario = pd.DataFrame({'Potencia_kW': s_sorted_diario, 'Porcentaje_Tiempo': pct_tiempo_diario}); pico_kw_diario_ldc = metrics_dashboard['pico_kw_diario']; media_kw_diaria_ldc = metrics_dashboard['media_kw_diaria']
-    fig_ldc_diario = px.area(df_ldc_diario, x='Porcentaje_Tiempo', y='Potencia_kW', title="LDC Diaria", labels={'Porcentaje_Tiempo': '% Horas Día', 'Potencia_kW': 'kW'}); fig_ldc_diario.add_hline(y=pico_kw_diario_ldc, line_dash="dot", annotation_text=f"Pico: {pico_kw_diario_ldc:.2f} kW"); fig_ldc_diario.add_hline(y=media_kw_diaria_ldc, line_dash="dash", annotation_text=f"Prom: {media_kw_diaria_ldc:.2f} kW", line_color="#2ECC71"); fig_ldc_diario.update_layout(title_x=0.5, template="plotly_dark")
+    clave_figuras = (st.session_state.dataset.clave, escenario, porcentaje_diurno, hora_diurna_inicio, hora_diurna_fin)
+    def mostrar_figura(nombre: str, constructor):
+        with instr.etapa(f"figura:{nombre}") as etapa:
+            figura, acierto = obtener_cache_figuras().obtener(clave_figuras + (nombre,), constructor)
+            etapa.nota = "caché" if acierto else "construida"; st.plotly_chart(figura, use_container_width=True)
 
 # --- RENDERIZADO DE PESTAÑAS (depende de si hay datos) ---
-with st.container(border=True):
+if pestana == PESTANAS[1]:
     with tab_dashboard:
         st.header("Dashboard")
-        if st.session_state.df_consumo.empty: st.info("👆 Carga/genera datos.")
+        if st.session_state.dataset is None: st.info("👆 Carga/genera datos.")
         else:
             st.subheader("📊 Métricas Clave")
             cols1, cols2 = st.columns(2)
             with cols1: st.metric("🔼 Pico Diario", f"{metrics_dashboard['pico_kw_diario']:.2f} kW"); st.metric("📅 Consumo Mensual", f"{metrics_dashboard['consumo_mensual_kwh']:,.0f} kWh")
             with cols2: st.metric("↔️ Prom. Diario", f"{metrics_dashboard['media_kw_diaria']:.2f} kW"); st.metric("🗓️ Consumo Anual", f"{metrics_dashboard['consumo_anual_kwh']:,.0f} kWh")
+            # Picos de la serie completa: demanda a la resolución nativa y media de cada hora de reloj
+            cols3, cols4 = st.columns(2)
+            with cols3: st.metric(f"⚡ Pico Demanda ({resultado['intervalo_min']:.0f} min)", f"{pico_kw_anual:.2f} kW")
+            with cols4: st.metric("🕐 Pico Horario", f"{resultado['pico_kw_horario']:.2f} kW")
+            st.caption(f"Datos a {resultado['intervalo_min']:.0f} min; energía integrada por intervalo ({total_kwh_anual:,.0f} kWh en el periodo cargado).")
             st.markdown("---"); st.subheader("📈 Perfiles Diarios")
-            st.plotly_chart(fig_curva, use_container_width=True)
-            st.plotly_chart(fig_barras_diario, use_container_width=True)
+            mostrar_figura('curva', lambda: figura_linea_perfil(df_perfil_diario, "Perfil Diario (Línea)"))
+            mostrar_figura('barras', lambda: figura_barras_perfil(df_perfil_diario, "Perfil Diario (Barras)"))
             st.markdown("---"); st.subheader("⏱️ Diurno/Nocturno")
             c1, c2 = st.columns(2)
-            with c1: st.plotly_chart(fig_diurno, use_container_width=True)
-            with c2: st.plotly_chart(fig_nocturno, use_container_width=True)
+            with c1: mostrar_figura('diurno', lambda: figura_linea_perfil(df_perfil_diario[df_perfil_diario['Hora'].isin(horas_diurnas_list)], "Perfil Diurno"))
+            with c2: mostrar_figura('nocturno', lambda: figura_linea_perfil(df_perfil_diario[~df_perfil_diario['Hora'].isin(horas_diurnas_list)], "Perfil Nocturno"))
             st.markdown("---"); st.subheader("🔥 Heatmap Semanal")
             st.caption("Potencia prom. (kW) por hora y día.")
-            st.plotly_chart(fig_heatmap, use_container_width=True)
-
-with st.container(border=True):
+            mostrar_figura('heatmap', lambda: figura_heatmap(resultado['heatmap']))
+            st.markdown("---"); st.subheader("🧮 Barrido de Escenarios")
+            with st.expander("Comparar Escenario × Reparto × Horario Diurno", expanded=False):
+                ventanas_opts = {f"{i:%H:%M}-{f:%H:%M}": (i, f) for i, f in [(hora_diurna_inicio, hora_diurna_fin)] + VENTANAS_BARRIDO}
+                ventanas_sel = st.multiselect("Horarios diurnos", list(ventanas_opts), default=list(ventanas_opts)[:2], key="barrido_ventanas")
+                paso_reparto = st.select_slider("Paso de reparto (%)", [1, 5, 10, 25], 5, key="barrido_paso")
+                if ventanas_sel:
+                    with instr.etapa('barrido') as etapa_barrido:
+                        df_barrido = barrido_escenarios(cubo, repartos=range(0, 101, paso_reparto), ventanas=[ventanas_opts[k] for k in ventanas_sel]); etapa_barrido.filas = len(df_barrido)
+                    st.caption(f"{len(df_barrido)} combinaciones. Haz clic en una columna para ordenar.")
+                    st.dataframe(df_barrido, use_container_width=True, hide_index=True)
+                    st.download_button("📥 Descargar Barrido (CSV)", df_barrido.to_csv(index=False).encode('utf-8'), "barrido_escenarios.csv", "text/csv")
+            st.markdown("---"); st.subheader("💲 Costo por Tarifa")
+            st.caption("Costo anual de la serie ajustada: energía por periodo horario, bloques sobre kWh mensual, demanda sobre el pico mensual y cargo fijo.")
+            st.dataframe(df_tarifas.style.format({c: "{:,.2f}" for c in df_tarifas.columns[1:]}), use_container_width=True, hide_index=True)
+            with st.expander("Detalle mensual y definición de tarifas"):
+                st.dataframe(df_tarifas_mes.style.format("{:,.2f}"), use_container_width=True)
+                archivo_tarifas = st.file_uploader("Cargar tarifas (JSON)", type=['json'], key="archivo_tarifas")
+                if archivo_tarifas is not None and st.session_state.get('tarifas_id') != archivo_tarifas.file_id:
+                    try: st.session_state.tarifas = cargar_tarifas(archivo_tarifas); st.session_state.tarifas_id = archivo_tarifas.file_id; st.rerun()
+                    except ValueError as e: st.error(f"Error: Tarifas rechazadas. {e}")
+                st.json(st.session_state.tarifas, expanded=False)
+
+if pestana == PESTANAS[2]:
     with tab_ldc:
         st.header("LDC - Diario")
-        if st.session_state.df_consumo.empty: st.info("👆 Carga/genera datos.")
+        if st.session_state.dataset is None: st.info("👆 Carga/genera datos.")
         else:
             st.subheader("⚡ LDC (Diaria)")
             st.info("Ordena potencia diaria (0-23h) de > a <.")
-            st.plotly_chart(fig_ldc_diario, use_container_width=True)
+            df_ldc_diario = ldc_exacta(df_perfil_diario['Potencia_kW'])
+            mostrar_figura('ldc_diario', lambda: figura_ldc(df_ldc_diario, "LDC Diaria", '% Horas Día', metrics_dashboard['pico_kw_diario'], metrics_dashboard['media_kw_diaria']))
             with st.expander("Ver tabla"): st.dataframe(df_ldc_diario, use_container_width=True)
+            st.subheader("⚡ LDC (Anual)")
+            st.caption(f"Curva de {PUNTOS_LDC} puntos desde histograma (error relativo ≤ {ALFA_SKETCH:.0%}); pico y promedio exactos.")
+            mostrar_figura('ldc_anual', lambda: figura_ldc(ldc_desde_cubo(cubo, resultado['factores'], pico_kw_anual), "LDC Anual", '% Horas Año', pico_kw_anual, media_kw_anual))
 
 # --- PESTAÑA DE EXPORTACIÓN MODIFICADA ---
-with st.container(border=True):
+if pestana == PESTANAS[3]:
     with tab_exportar:
         st.header("Exportar")
-        if st.session_state.df_consumo.empty:
+        if st.session_state.dataset is None:
             st.warning("No hay datos para exportar.")
         else:
             filename = "perfil_consumo_calculado"
             st.subheader("🗂️ Descargar Datos de Consumo")
             st.markdown("Descarga el perfil de consumo anual ajustado en formato CSV.")
             
-            csv_data = df_ajustado.to_csv().encode('utf-8')
+            with instr.etapa('exportar_csv', len(df_consumo)):
+                df_ajustado = ajustar_serie(df_consumo, resultado['factores'])
+                csv_data = df_ajustado.to_csv().encode('utf-8')
             
             # MODIFICADO: Reemplazado use_container_width=True con width='stretch'
             st.download_button(
@@ -445,9 +552,28 @@ with st.container(border=True):
                 mime="text/csv",
                 type="primary"
             )
+            st.subheader("📄 Reporte PDF")
+            # El PDF se renderiza en el pool de trabajos, una vez por dataset + ajustes + tarifas
+            clave_pdf = f"pdf-{clave_de(clave_figuras, st.session_state.tarifas)}"
+            if not trabajo_descartado(clave_pdf):
+                with instr.etapa('pdf'): trabajo_pdf = obtener_trabajos().enviar(clave_pdf, lambda progreso=None: generar_reporte_pdf(metrics_dashboard, df_perfil_diario, df_tarifas), descripcion="Reporte PDF", sesion=st.session_state.id_sesion)
+                if trabajo_pdf.activo: seguir_trabajo(trabajo_pdf, "Generando PDF")
+                elif trabajo_pdf.estado == TERMINADO: st.download_button("📥 PDF Perfil Diario", trabajo_pdf.resultado, f"{filename}_reporte.pdf", "application/pdf")
+                else: st.warning(f"No se pudo generar el PDF. Error: {trabajo_pdf.error}")
 
 # --- MENSAJES INICIALES SI NO HAY DATOS ---
-if st.session_state.df_consumo.empty:
-    with tab_dashboard: st.info("👆 Carga/genera datos en 'Ingreso Datos'.")
-    with tab_ldc: st.info("👆 Carga/genera datos en 'Ingreso Datos'.")
+if st.session_state.dataset is None and pestana in PESTANAS[1:3]:
+    with (tab_dashboard if pestana == PESTANAS[1] else tab_ldc): st.info("👆 Carga/genera datos en 'Ingreso Datos'.")
         
+
+# --- DIAGNÓSTICO (opcional) ---
+with st.sidebar:
+    st.markdown("---")
+    st.checkbox("🩺 Diagnóstico", key="diagnostico", help="Mide tiempo y filas de cada etapa del rerun de esta sesión (y si cada figura salió de la caché) y las guarda como JSON lines. La memoria por etapa solo se mide si el servidor arranca con POWERSMART_DIAGNOSTICO=1: usa tracemalloc, que es de todo el proceso y hace más lentas a todas las sesiones.")
+    registros_diagnostico = instr.cerrar()
+    if registros_diagnostico:
+        with st.expander("Etapas del rerun", expanded=True):
+            df_diagnostico = pd.DataFrame(registros_diagnostico).assign(ms=lambda d: d['segundos'] * 1000).drop(columns=['segundos'])
+            columnas = ['etapa', 'ms', 'filas', 'nota'] + (['asignado_mb', 'pico_mb'] if instr.memoria else [])
+            st.dataframe(df_diagnostico[columnas].style.format({'ms': "{:,.1f}", 'filas': "{:,.0f}", 'asignado_mb': "{:,.2f}", 'pico_mb': "{:,.2f}"}, na_rep="-"), use_container_width=True, hide_index=True)
+            st.caption(f"Sesión {st.session_state.id_sesion} · guardado en {instr.ruta}")
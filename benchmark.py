@@ -0,0 +1,202 @@
+# benchmark.py
+"""Benchmark de las etapas de ingesta, cálculo y exportación sobre datasets sintéticos de un año.
+
+Uso:
+    python benchmark.py -o resultados.json [--rapido] [--completo] [--repeticiones 3] [--datos CARPETA]
+    python benchmark.py -o nuevo.json --comparar base.json [--umbral 1.25] [--piso-ms 5]
+
+Genera series horarias, de 15 min y de 1 min en CSV y XLSX, y hojas de perfil de carga; mide cada etapa por
+separado (mediana de N repeticiones) y su pico de memoria (una corrida extra con tracemalloc, que numpy y pandas
+informan). El JSON incluye el commit y las versiones para comparar corridas; `--comparar` marca como regresión
+toda etapa cuyo tiempo crezca más que `--umbral` veces (y más de `--piso-ms`, para ignorar el ruido de las etapas
+de microsegundos) y termina con código 1.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time as reloj
+import tracemalloc
+from datetime import datetime, time
+import numpy as np
+import pandas as pd
+from analisis import CuboAgregado, calcular_escenario, ajustar_serie, barrido_escenarios
+from graficos import figura_heatmap
+from ingesta import leer_serie_por_bloques, leer_perfil_carga
+from ldc import ldc_desde_cubo
+from perfiles import generar_perfil, perfiles_desde_facturas, MESES
+from reportes import generar_reporte_pdf
+from tarifas import BaseFacturacion, cargar_tarifas, facturar
+
+YEAR = 2025
+RESOLUCIONES = {'1h': 'h', '15min': '15min', '1min': 'min'}
+N_APARATOS = (10, 100, 1000, 10000)
+N_CARGAS_HOJA = (50, 1000)
+
+
+# --- DATOS SINTÉTICOS ---
+def serie_sintetica(freq: str, semilla: int = 0) -> pd.DataFrame:
+    """Un año de potencia con forma diaria, estacionalidad y ruido (kW, sin huecos)."""
+    rng = np.random.default_rng(semilla)
+    idx = pd.date_range(f'{YEAR}-01-01', f'{YEAR}-12-31 23:59', freq=freq, name='Timestamp')
+    hora = idx.hour.to_numpy() + idx.minute.to_numpy() / 60
+    diaria = 1.0 + 0.8 * np.exp(-((hora - 20) ** 2) / 6) + 0.4 * np.exp(-((hora - 8) ** 2) / 4)
+    estacional = 1.0 + 0.25 * np.cos(2 * np.pi * (idx.dayofyear.to_numpy() - 200) / 365)
+    return pd.DataFrame({'Potencia_kW': diaria * estacional * rng.lognormal(0, 0.25, len(idx))}, index=idx)
+
+
+def items_sinteticos(n: int, semilla: int = 0) -> list:
+    rng = np.random.default_rng(semilla)
+    return [{"nombre": f"Carga {i}", "cantidad": int(rng.integers(1, 10)), "potencia_w": float(rng.integers(5, 3000)),
+             "dias_por_semana": int(rng.integers(1, 8)), "horas_de_uso": sorted(rng.choice(24, int(rng.integers(1, 24)), replace=False).tolist())}
+            for i in range(n)]
+
+
+def escribir_serie(df: pd.DataFrame, ruta: str):
+    tabla = pd.DataFrame({'Timestamp': df.index.strftime('%Y-%m-%d %H:%M'), 'Potencia_kW': df['Potencia_kW'].round(4).to_numpy()})
+    if ruta.endswith('.csv'): tabla.to_csv(ruta, index=False)
+    else: tabla.to_excel(ruta, index=False, engine='openpyxl')
+
+
+def escribir_hoja_perfil(n_cargas: int, ruta: str, semilla: int = 0):
+    """Hoja de perfil de carga: 7 filas de cabecera libre y luego 'Carga', 'Potencia (W)', 0..23 con 1 = en uso."""
+    rng = np.random.default_rng(semilla)
+    tabla = pd.DataFrame({'Carga': [f"Carga {i}" for i in range(n_cargas)], 'Potencia (W)': rng.integers(5, 3000, n_cargas)})
+    tabla = pd.concat([tabla, pd.DataFrame((rng.random((n_cargas, 24)) < 0.3).astype(int), columns=[str(h) for h in range(24)])], axis=1)
+    cabecera = pd.DataFrame([["Perfil de carga sintético"] + [None] * (tabla.shape[1] - 1)] + [[None] * tabla.shape[1]] * 6)
+    filas = pd.concat([cabecera, pd.DataFrame([tabla.columns.tolist()]), pd.DataFrame(tabla.to_numpy())], ignore_index=True)
+    if ruta.endswith('.csv'): filas.to_csv(ruta, index=False, header=False)
+    else: filas.to_excel(ruta, index=False, header=False, engine='openpyxl')
+
+
+def preparar_datos(carpeta: str, resoluciones: list, xlsx_max_filas: int) -> dict:
+    """Escribe los archivos que falten y devuelve {(nombre, formato): ruta}."""
+    os.makedirs(carpeta, exist_ok=True); rutas = {}
+    for nombre in resoluciones:
+        df = None
+        for formato in ('csv', 'xlsx'):
+            ruta = os.path.join(carpeta, f"serie_{nombre}.{formato}")
+            if formato == 'xlsx' and len(pd.date_range(f'{YEAR}-01-01', f'{YEAR}-12-31 23:59', freq=RESOLUCIONES[nombre])) > xlsx_max_filas: continue
+            if not os.path.exists(ruta):
+                df = serie_sintetica(RESOLUCIONES[nombre]) if df is None else df
+                escribir_serie(df, ruta)
+            rutas[(nombre, formato)] = ruta
+    for n in N_CARGAS_HOJA:
+        for formato in ('csv', 'xlsx'):
+            ruta = os.path.join(carpeta, f"perfil_{n}.{formato}")
+            if not os.path.exists(ruta): escribir_hoja_perfil(n, ruta)
+            rutas[(f"perfil_{n}", formato)] = ruta
+    return rutas
+
+
+# --- MEDICIÓN ---
+def medir(funcion, repeticiones: int) -> tuple:
+    """(métricas, resultado): mediana y mínimo de `repeticiones` corridas y pico de memoria de una corrida más."""
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = reloj.perf_counter(); resultado = funcion(); tiempos.append(reloj.perf_counter() - t0)
+    del resultado; gc.collect()
+    tracemalloc.start()
+    try: resultado = funcion(); _, pico = tracemalloc.get_traced_memory()
+    finally: tracemalloc.stop()
+    return {'segundos': float(np.median(tiempos)), 'segundos_min': float(min(tiempos)), 'repeticiones': repeticiones, 'pico_mb': pico / 1048576}, resultado
+
+
+def etapas_serie(df: pd.DataFrame, repeticiones: int):
+    """Etapas del dashboard y la exportación sobre una serie ya cargada, en el orden del script."""
+    inicio, fin = time(6, 0), time(18, 0); tarifas = cargar_tarifas()
+    m, cubo = medir(lambda: CuboAgregado.desde_serie(df['Potencia_kW']), repeticiones); yield 'cubo', m
+    m, resultado = medir(lambda: calcular_escenario(cubo, "Verano / Seca", 40, inicio, fin), repeticiones); yield 'escenario_reescalado', m
+    # El pivot del heatmap sale de calcular_escenario; aquí se mide la figura Plotly y su serialización
+    m, _ = medir(lambda: figura_heatmap(resultado['heatmap']).to_json(), repeticiones); yield 'figura_heatmap', m
+    m, _ = medir(lambda: ldc_desde_cubo(cubo, resultado['factores'], resultado['pico_kw_anual']), repeticiones); yield 'ldc', m
+    m, _ = medir(lambda: barrido_escenarios(cubo), repeticiones); yield 'barrido', m
+    m, _ = medir(lambda: facturar(BaseFacturacion.desde_cubo(cubo, resultado['factores']), tarifas), repeticiones); yield 'tarifas', m
+    m, _ = medir(lambda: ajustar_serie(df, resultado['factores']).to_csv().encode('utf-8'), repeticiones); yield 'exportar_csv', m
+    m, _ = medir(lambda: generar_reporte_pdf(resultado['metrics_dashboard'], resultado['perfil_diario']), repeticiones); yield 'pdf', m
+
+
+def correr(rutas: dict, resoluciones: list, repeticiones: int, aparatos: tuple) -> list:
+    filas = []
+    def anotar(etapa, caso, n, metricas):
+        fila = {'etapa': etapa, 'caso': caso, 'filas': int(n), **metricas}; filas.append(fila)
+        print(f"{etapa:<28} {caso:<18} {n:>9,} filas {fila['segundos'] * 1000:>10.1f} ms {fila['pico_mb']:>9.1f} MB", flush=True)
+    for nombre in resoluciones:
+        df = None
+        for formato in ('csv', 'xlsx'):
+            ruta = rutas.get((nombre, formato))
+            if ruta is None: continue
+            m, df_leido = medir(lambda: leer_serie_por_bloques(ruta), repeticiones if formato == 'csv' else 1)
+            anotar('cargar_datos_masivos', f"{nombre}/{formato}", len(df_leido), m); df = df_leido if df is None else df
+        for etapa, m in etapas_serie(df, repeticiones): anotar(etapa, nombre, len(df), m)
+    for n in N_CARGAS_HOJA:
+        for formato in ('csv', 'xlsx'):
+            ruta = rutas[(f"perfil_{n}", formato)]
+            m, _ = medir(lambda: leer_perfil_carga(ruta, year=YEAR), repeticiones); anotar('cargar_perfil_desde_archivo', f"{n}/{formato}", n, m)
+    for n in aparatos:
+        items = items_sinteticos(n)
+        m, _ = medir(lambda: generar_perfil(items, YEAR), repeticiones); anotar('generar_perfil_manual', f"aparatos={n}", n, m)
+    facturas = pd.DataFrame(np.random.default_rng(0).uniform(50, 800, (1000, 12)), columns=MESES)
+    m, _ = medir(lambda: perfiles_desde_facturas(facturas, YEAR), repeticiones); anotar('perfiles_desde_facturas', "clientes=1000", 1000, m)
+    return filas
+
+
+def metadatos() -> dict:
+    try: commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError: commit = None
+    return {'commit': commit, 'fecha': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'plataforma': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def comparar(actual: list, base: list, umbral: float, piso_s: float = 0.005) -> list:
+    """Filas (etapa, caso, base, actual, razón, regresión) para los pares presentes en ambas corridas."""
+    previos = {(r['etapa'], r['caso']): r for r in base}; salida = []
+    for r in actual:
+        b = previos.get((r['etapa'], r['caso']))
+        if b is None or b['segundos'] <= 0: continue
+        razon = r['segundos'] / b['segundos']
+        salida.append({'etapa': r['etapa'], 'caso': r['caso'], 'base_s': b['segundos'], 'actual_s': r['segundos'], 'razon': razon,
+                       'pico_mb_base': b['pico_mb'], 'pico_mb_actual': r['pico_mb'], 'regresion': razon > umbral and r['segundos'] - b['segundos'] > piso_s})
+    return salida
+
+
+def _positivo(texto: str) -> int:
+    valor = int(texto)
+    if valor < 1: raise argparse.ArgumentTypeError(f"debe ser al menos 1, no {valor}")
+    return valor
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--salida', default='benchmark.json', help="JSON con metadatos y resultados")
+    parser.add_argument('--datos', default=os.path.join(tempfile.gettempdir(), 'powersmart_benchmark'), help="Carpeta de datasets (se reutilizan)")
+    parser.add_argument('--repeticiones', type=_positivo, default=3, help="Corridas cronometradas por etapa (al menos 1)")
+    parser.add_argument('--rapido', action='store_true', help="Solo horario y 15 min, hasta 1000 aparatos")
+    parser.add_argument('--completo', action='store_true', help="Incluye el XLSX de 1 min (525.600 filas; lento de escribir)")
+    parser.add_argument('--comparar', help="JSON de una corrida anterior")
+    parser.add_argument('--umbral', type=float, default=1.25, help="Razón de tiempo a partir de la cual se marca regresión")
+    parser.add_argument('--piso-ms', type=float, default=5.0, help="Diferencia mínima en ms para considerar regresión")
+    args = parser.parse_args(argv)
+
+    resoluciones = ['1h', '15min'] if args.rapido else list(RESOLUCIONES)
+    aparatos = tuple(n for n in N_APARATOS if n <= 1000) if args.rapido else N_APARATOS
+    rutas = preparar_datos(args.datos, resoluciones, xlsx_max_filas=10 ** 7 if args.completo else 100_000)
+    documento = {'meta': metadatos(), 'resultados': correr(rutas, resoluciones, args.repeticiones, aparatos)}
+    codigo = 0
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f: base = json.load(f)
+        documento['comparacion'] = {'base': base.get('meta', {}), 'umbral': args.umbral, 'etapas': comparar(documento['resultados'], base['resultados'], args.umbral, args.piso_ms / 1000)}
+        for c in documento['comparacion']['etapas']:
+            print(f"{'REGRESIÓN' if c['regresion'] else 'ok':<10} {c['etapa']:<28} {c['caso']:<18} x{c['razon']:.2f}")
+        codigo = int(any(c['regresion'] for c in documento['comparacion']['etapas']))
+    with open(args.salida, 'w', encoding='utf-8') as f: json.dump(documento, f, indent=1, ensure_ascii=False)
+    print(f"Resultados en {args.salida}")
+    return codigo
+
+
+if __name__ == '__main__':
+    sys.exit(main())
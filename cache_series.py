@@ -0,0 +1,91 @@
+# cache_series.py
+"""Caché en disco (Parquet) de series normalizadas 'Potencia_kW', indexada por hash del contenido subido."""
+import hashlib
+import os
+import tempfile
+import threading
+import pandas as pd
+
+VERSION_FORMATO = 2  # Subir si cambia la normalización de ingesta, invalida entradas anteriores.
+DIRECTORIO_DEFECTO = os.environ.get('POWERSMART_CACHE_DIR', os.path.join('.cache', 'series'))
+MAX_MB_DEFECTO = float(os.environ.get('POWERSMART_CACHE_MB', 512))
+
+
+def hash_contenido(fuente, tam_bloque: int = 1 << 20) -> str:
+    """Hash BLAKE2b del contenido crudo (ruta o archivo binario), leído por bloques."""
+    h = hashlib.blake2b(digest_size=20)
+    if isinstance(fuente, (str, os.PathLike)):
+        with open(fuente, 'rb') as f:
+            for bloque in iter(lambda: f.read(tam_bloque), b''): h.update(bloque)
+        return h.hexdigest()
+    fuente.seek(0)
+    for bloque in iter(lambda: fuente.read(tam_bloque), b''): h.update(bloque)
+    fuente.seek(0)
+    return h.hexdigest()
+
+
+def huella_dataframe(df: pd.DataFrame) -> str:
+    """Hash del índice y los valores de un DataFrame ya cargado (para datasets generados, sin archivo de origen)."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(df.index.asi8.tobytes() if isinstance(df.index, pd.DatetimeIndex) else pd.util.hash_pandas_object(df.index).to_numpy().tobytes())
+    for col in df.columns: h.update(str(col).encode()); h.update(df[col].to_numpy(dtype='float64').tobytes())
+    return h.hexdigest()
+
+
+class CacheSeries:
+    """Guarda DataFrames en Parquet con expulsión LRU por tamaño total (usa mtime como marca de último uso)."""
+
+    def __init__(self, directorio: str = DIRECTORIO_DEFECTO, max_mb: float = MAX_MB_DEFECTO):
+        self.directorio = directorio
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.aciertos = self.fallos = self.expulsiones = 0
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"v{VERSION_FORMATO}-{clave}.parquet")
+
+    def obtener(self, clave: str):
+        """Devuelve el DataFrame guardado (lectura mapeada en memoria) o None si no existe."""
+        ruta = self._ruta(clave)
+        try:
+            df = pd.read_parquet(ruta, engine='pyarrow', memory_map=True)
+            os.utime(ruta)
+        except (FileNotFoundError, OSError):
+            with self._lock: self.fallos += 1
+            return None
+        with self._lock: self.aciertos += 1
+        return df
+
+    def guardar(self, clave: str, df: pd.DataFrame):
+        ruta = self._ruta(clave)
+        fd, tmp = tempfile.mkstemp(dir=self.directorio, suffix='.tmp'); os.close(fd)
+        try:
+            df.to_parquet(tmp, engine='pyarrow')
+            os.replace(tmp, ruta)
+        finally:
+            if os.path.exists(tmp): os.remove(tmp)
+        self._podar()
+
+    def _entradas(self) -> list:
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            if not nombre.endswith('.parquet'): continue
+            try: info = os.stat(os.path.join(self.directorio, nombre))
+            except FileNotFoundError: continue
+            entradas.append((info.st_mtime, info.st_size, nombre))
+        return sorted(entradas)
+
+    def _podar(self):
+        with self._lock:
+            entradas = self._entradas(); total = sum(e[1] for e in entradas)
+            for _, tam, nombre in entradas:
+                if total <= self.max_bytes: break
+                try: os.remove(os.path.join(self.directorio, nombre))
+                except FileNotFoundError: pass
+                total -= tam; self.expulsiones += 1
+
+    def estadisticas(self) -> dict:
+        entradas = self._entradas()
+        return {'directorio': os.path.abspath(self.directorio), 'entradas': len(entradas), 'mb_usados': sum(e[1] for e in entradas) / 1048576,
+                'mb_max': self.max_bytes / 1048576, 'aciertos': self.aciertos, 'fallos': self.fallos, 'expulsiones': self.expulsiones}
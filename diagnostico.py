@@ -0,0 +1,85 @@
+# diagnostico.py
+"""Instrumentación por rerun: tiempo, filas y (opcionalmente) memoria asignada de cada etapa del script, en JSON lines.
+
+Desactivada, `etapa()` devuelve siempre el mismo contexto vacío (sin relojes ni tracemalloc), así que el costo
+es una llamada. La casilla de una sesión mide solo tiempo y filas con `perf_counter`: no afecta a las demás.
+La memoria se mide con tracemalloc únicamente con POWERSMART_DIAGNOSTICO activo, porque tracemalloc es de todo
+el proceso: hace unas dos veces más lentas las asignaciones de todas las sesiones y su pico es uno solo, así que
+con sesiones concurrentes sus asignaciones se suman a la etapa y el pico de una etapa puede reiniciarlo otra.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+RUTA_DEFECTO = os.environ.get('POWERSMART_DIAGNOSTICO_RUTA', os.path.join('.cache', 'diagnostico.jsonl'))
+FORZADO = os.environ.get('POWERSMART_DIAGNOSTICO', '') not in ('', '0')  # instrumenta todas las sesiones y mide memoria
+
+_lock = threading.Lock()
+
+
+class _EtapaNula:
+    filas = nota = None
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+
+_NULA = _EtapaNula()
+
+
+class _Etapa:
+    def __init__(self, instrumentacion: 'Instrumentacion', nombre: str, filas):
+        self._instr, self.nombre, self.filas, self.nota = instrumentacion, nombre, filas, None
+
+    def __enter__(self):
+        if self._instr.memoria: tracemalloc.reset_peak(); self._mem0 = tracemalloc.get_traced_memory()[0]
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, *exc):
+        segundos = time.perf_counter() - self._t0; asignado = pico = None
+        if self._instr.memoria:
+            actual, pico = tracemalloc.get_traced_memory()
+            asignado, pico = (actual - self._mem0) / 1048576, max(0, pico - self._mem0) / 1048576
+        self._instr.registrar(self.nombre, segundos, self.filas, asignado, pico, error=tipo.__name__ if tipo else None, nota=self.nota)
+        return False
+
+
+class Instrumentacion:
+    """Registro de las etapas de un rerun. Las etapas no se anidan: el pico de memoria se reinicia en cada una.
+
+    `nota` de una etapa (p. ej. si una figura salió de la caché) se guarda tal cual. Con POWERSMART_DIAGNOSTICO,
+    tracemalloc se arranca una vez y sigue activo mientras viva el proceso: todos los reruns se instrumentan.
+    """
+
+    def __init__(self, activo: bool, sesion: str = '', ruta: str = RUTA_DEFECTO):
+        self.activo = activo or FORZADO; self.memoria = FORZADO; self.sesion, self.ruta = sesion, ruta
+        self.registros = []; self._inicio = time.perf_counter()
+        if self.memoria:
+            with _lock:
+                if not tracemalloc.is_tracing(): tracemalloc.start()
+
+    def etapa(self, nombre: str, filas: int = None):
+        """Contexto que mide una etapa; `filas` se puede fijar también dentro del bloque (`e.filas = n`)."""
+        return _Etapa(self, nombre, filas) if self.activo else _NULA
+
+    def registrar(self, nombre: str, segundos: float, filas: int = None, asignado_mb: float = None, pico_mb: float = None, error: str = None, nota: str = None):
+        """Agrega una etapa medida por fuera (p. ej. un trabajo de fondo que terminó)."""
+        if not self.activo: return
+        self.registros.append({'etapa': nombre, 'segundos': segundos, 'filas': None if filas is None else int(filas),
+                               'asignado_mb': asignado_mb, 'pico_mb': pico_mb, 'error': error, 'nota': nota})
+
+    def cerrar(self) -> list:
+        """Cierra el rerun: agrega el total, escribe las líneas JSON y devuelve los registros."""
+        if not self.activo: return []
+        self.activo = False
+        self.registros.append({'etapa': 'rerun_total', 'segundos': time.perf_counter() - self._inicio, 'filas': None, 'asignado_mb': None, 'pico_mb': None, 'error': None, 'nota': None})
+        marca = datetime.now().isoformat(timespec='milliseconds')
+        lineas = ''.join(json.dumps({'ts': marca, 'sesion': self.sesion, **r}, ensure_ascii=False) + '\n' for r in self.registros)
+        try:
+            os.makedirs(os.path.dirname(self.ruta) or '.', exist_ok=True)
+            with _lock, open(self.ruta, 'a', encoding='utf-8') as f: f.write(lineas)
+        except OSError: pass
+        return self.registros
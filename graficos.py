@@ -0,0 +1,91 @@
+# graficos.py
+"""Construcción de figuras Plotly, reducción de puntos y caché de figuras construidas."""
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+MAX_PUNTOS = 1500
+
+
+def reducir_lttb(x, y, n_max: int = MAX_PUNTOS) -> np.ndarray:
+    """Índices de los puntos que conserva Largest-Triangle-Three-Buckets (mantiene picos y forma visual)."""
+    x = np.asarray(x, dtype='float64'); y = np.asarray(y, dtype='float64'); n = len(x)
+    if n <= n_max or n_max < 3: return np.arange(n)
+    bordes = np.linspace(1, n - 1, n_max - 1).astype(np.int64)
+    elegidos = np.empty(n_max, dtype=np.int64); elegidos[0], elegidos[-1] = 0, n - 1
+    a = 0
+    for i in range(n_max - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        sig_ini, sig_fin = bordes[i + 1], (bordes[i + 2] if i + 2 < len(bordes) else n)
+        x_prom, y_prom = x[sig_ini:sig_fin].mean(), y[sig_ini:sig_fin].mean()
+        areas = np.abs((x[a] - x_prom) * (y[ini:fin] - y[a]) - (x[a] - x[ini:fin]) * (y_prom - y[a]))
+        a = ini + int(np.argmax(areas)); elegidos[i + 1] = a
+    return elegidos
+
+
+def reducir_puntos(df: pd.DataFrame, x: str, y: str, n_max: int = MAX_PUNTOS) -> pd.DataFrame:
+    """Submuestreo LTTB de un DataFrame para graficar; los índices datetime se tratan como números."""
+    if len(df) <= n_max: return df
+    eje_x = df[x] if x in df.columns else df.index.to_series()
+    valores_x = eje_x.to_numpy().astype('int64') if np.issubdtype(eje_x.dtype, np.datetime64) else eje_x.to_numpy()
+    return df.iloc[reducir_lttb(valores_x, df[y].to_numpy(), n_max)]
+
+
+# --- CONSTRUCCIÓN DE FIGURAS ---
+ETIQUETAS_KW = {'Hora': 'Hora', 'Potencia_kW': 'kW'}
+
+
+def figura_linea_perfil(df_perfil: pd.DataFrame, titulo: str) -> go.Figure:
+    fig = px.line(reducir_puntos(df_perfil, 'Hora', 'Potencia_kW'), x='Hora', y='Potencia_kW', title=titulo, markers=True, labels=ETIQUETAS_KW); fig.update_layout(title_x=0.5, template="plotly_dark")
+    return fig
+
+
+def figura_barras_perfil(df_perfil: pd.DataFrame, titulo: str) -> go.Figure:
+    fig = px.bar(df_perfil, x='Hora', y='Potencia_kW', title=titulo, labels=ETIQUETAS_KW); fig.update_layout(title_x=0.5, template="plotly_dark")
+    return fig
+
+
+def figura_heatmap(pivot: pd.DataFrame) -> go.Figure:
+    fig = px.imshow(pivot, labels=dict(x="Día", y="Hora", color="kW"), color_continuous_scale='YlOrRd', aspect='auto'); fig.update_yaxes(autorange='reversed'); fig.update_layout(title_x=0.5, template="plotly_dark", title="Heatmap Semanal Prom.")
+    return fig
+
+
+def figura_ldc(df_ldc: pd.DataFrame, titulo: str, etiqueta_x: str, pico: float, media: float) -> go.Figure:
+    fig = px.area(reducir_puntos(df_ldc, 'Porcentaje_Tiempo', 'Potencia_kW'), x='Porcentaje_Tiempo', y='Potencia_kW', title=titulo, labels={'Porcentaje_Tiempo': etiqueta_x, 'Potencia_kW': 'kW'})
+    fig.add_hline(y=pico, line_dash="dot", annotation_text=f"Pico: {pico:.2f} kW"); fig.add_hline(y=media, line_dash="dash", annotation_text=f"Prom: {media:.2f} kW", line_color="#2ECC71"); fig.update_layout(title_x=0.5, template="plotly_dark")
+    return fig
+
+
+class CacheFiguras:
+    """LRU de figuras ya construidas (go.Figure) compartida entre sesiones; evita rehacer px.* en cada rerun.
+
+    Se guarda el objeto y no su JSON: st.plotly_chart acepta un go.Figure sin volver a validarlo, mientras que un
+    dict deserializado se revalida entero con go.Figure(**dict) en cada acierto (~10x más lento). Las figuras
+    guardadas no se modifican después (plotly_chart trabaja sobre una copia vía to_dict).
+    """
+
+    def __init__(self, max_entradas: int = 512):
+        self.max_entradas = max_entradas
+        self._figuras = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = self.fallos = 0
+
+    def obtener(self, clave: tuple, constructor) -> tuple:
+        """(figura, acierto) para `clave`; si no está, la construye con `constructor()`, la guarda y `acierto` es False."""
+        with self._lock:
+            if clave in self._figuras:
+                self._figuras.move_to_end(clave); self.aciertos += 1
+                return self._figuras[clave], True
+        figura = constructor()
+        with self._lock:
+            self.fallos += 1
+            self._figuras[clave] = figura; self._figuras.move_to_end(clave)
+            while len(self._figuras) > self.max_entradas: self._figuras.popitem(last=False)
+        return figura, False
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {'entradas': len(self._figuras), 'max_entradas': self.max_entradas, 'aciertos': self.aciertos, 'fallos': self.fallos}
@@ -0,0 +1,336 @@
+# ingesta.py
+"""Lectura por bloques de series de tiempo de medidores (CSV/XLSX) sin depender de Streamlit."""
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+from zoneinfo import available_timezones
+import numpy as np
+import pandas as pd
+from perfiles import plantilla_desde_arrays, generar_perfil_desde_plantilla
+
+COLUMNAS_TIEMPO = ['timestamp', 'fecha', 'time', 'date']
+COLUMNAS_POTENCIA = ['potencia_kw', 'kw', 'power_kw', 'potencia_w', 'w', 'consumo']
+TAM_BLOQUE = 250_000
+INTERVALOS_MIN = (1, 2, 3, 4, 5, 6, 10, 12, 15, 20, 30, 60)  # Resoluciones admitidas: divisores de la hora
+COLUMNAS_PERFIL = ['Carga', 'Potencia (W)']
+FILAS_DETECCION = 15
+# Zonas que se prueban primero al deducir la zona de desfases con horario de verano (varias IANA comparten reglas)
+ZONAS_PREFERIDAS = ('America/New_York', 'America/Chicago', 'America/Denver', 'America/Los_Angeles', 'America/Mexico_City',
+                    'America/Santiago', 'America/Asuncion', 'Europe/London', 'Europe/Madrid', 'Europe/Lisbon')
+
+TIPO_SERIE = 'serie'
+TIPO_PERFIL = 'perfil'
+TIPO_DESCONOCIDO = 'desconocido'
+
+
+class FormatoNoReconocido(ValueError):
+    """El archivo no tiene la estructura esperada; el mensaje explica el motivo."""
+
+
+class Deteccion(NamedTuple):
+    tipo: str
+    motivo: str = ''
+    fila_encabezado: int = 0
+
+
+def _nombre_de(fuente, nombre=None) -> str:
+    if nombre: return str(nombre)
+    return str(getattr(fuente, 'name', fuente))
+
+
+def _es_csv(nombre: str) -> bool:
+    return nombre.lower().endswith('.csv')
+
+
+def _rebobinar(fuente):
+    if hasattr(fuente, 'seek'): fuente.seek(0)
+    return fuente
+
+
+def elegir_columnas(columnas) -> tuple:
+    """Devuelve (col_tiempo, col_potencia) según la prioridad de nombres aceptados, o None si falta alguna."""
+    norm = {str(c).lower().strip(): c for c in columnas}
+    ts_col = next((norm[c] for c in COLUMNAS_TIEMPO if c in norm), None)
+    p_col = next((norm[c] for c in COLUMNAS_POTENCIA if c in norm), None)
+    return ts_col, p_col
+
+
+def adivinar_formato_fecha(muestra: pd.Series, n_muestra: int = 500):
+    """Infiere un formato strftime explícito (día/mes o mes/día) que interprete la mayor parte de la muestra.
+
+    Devuelve None si los valores no son texto o no se reconoce ningún formato.
+    """
+    valores = muestra.dropna()
+    if valores.empty or not isinstance(valores.iloc[0], str): return None
+    # Muestra repartida en todo el bloque: con datos por minuto las primeras filas son todas del día 1 y no desempatan
+    valores = valores.iloc[np.unique(np.linspace(0, len(valores) - 1, n_muestra).astype(np.int64))].astype(str).str.strip()
+    # En empate manda el orden: año primero -> año-mes-día (ISO); si no, día/mes
+    orden = (False, True) if valores.iloc[0][:4].isdigit() else (True, False)
+    candidatos = [f for f in dict.fromkeys(pd.tseries.api.guess_datetime_format(valores.iloc[0], dayfirst=d) for d in orden) if f is not None]
+    if not candidatos: return None
+    return max(candidatos, key=lambda f: pd.to_datetime(valores, format=f, errors='coerce', utc='%z' in f).notna().sum())
+
+
+def zona_de_desfases(instantes: pd.DatetimeIndex, desfases_min: np.ndarray):
+    """Zona horaria que reproduce los desfases UTC (minutos) observados en esos instantes, o None.
+
+    Un único desfase da una zona fija; si cambian (horario de verano) se busca la primera zona IANA que coincida.
+    """
+    desfases_min = np.asarray(desfases_min, dtype=np.int64)
+    if len(np.unique(desfases_min)) == 1: return timezone(timedelta(minutes=int(desfases_min[0])))
+    utc = instantes.tz_convert('UTC').tz_localize(None)
+    candidatas = sorted(z for z in available_timezones() if '/' in z and not z.startswith(('Etc/', 'SystemV/')))
+    for nombre in [z for z in ZONAS_PREFERIDAS if z in candidatas] + candidatas:
+        locales = instantes.tz_convert(nombre).tz_localize(None)
+        if np.array_equal((locales - utc) // pd.Timedelta(minutes=1), desfases_min): return nombre
+    return None
+
+
+class LectorFechas:
+    """Convierte bloques de texto a fechas con un formato fijo.
+
+    Si el formato lleva desfase UTC (%z), las fechas se leen en UTC y se pasan a una zona que reproduzca los
+    desfases del archivo: fija si no cambian o IANA si cambian (p. ej. -05:00/-04:00 por horario de verano).
+    Si un bloque posterior trae desfases que la zona no explica, se vuelve a deducir con todas las muestras.
+    """
+
+    def __init__(self, formato: str = None, n_muestra: int = 200):
+        self.formato, self.n_muestra = formato, n_muestra
+        self.con_desfase = bool(formato) and '%z' in formato
+        self.zona = None; self._instantes = []; self._desfases = []
+
+    def convertir(self, valores: pd.Series) -> pd.Series:
+        if not self.con_desfase: return pd.to_datetime(valores, format=self.formato, errors='coerce')
+        tiempos = pd.to_datetime(valores, format=self.formato, errors='coerce', utc=True)
+        validos = np.flatnonzero(tiempos.notna().to_numpy())
+        if len(validos):
+            elegidos = validos[np.unique(np.linspace(0, len(validos) - 1, self.n_muestra).astype(np.int64))]
+            instantes = pd.DatetimeIndex(tiempos.iloc[elegidos])
+            desfases = np.array([datetime.strptime(str(valores.iloc[i]).strip(), self.formato).utcoffset() // timedelta(minutes=1) for i in elegidos])
+            if self.zona is None or not np.array_equal((instantes.tz_convert(self.zona).tz_localize(None) - instantes.tz_localize(None)) // pd.Timedelta(minutes=1), desfases):
+                self._instantes.append(instantes); self._desfases.append(desfases)
+                self.zona = zona_de_desfases(self._instantes[0].append(self._instantes[1:]), np.concatenate(self._desfases))
+                if self.zona is None: raise FormatoNoReconocido("Las fechas traen desfases UTC que cambian sin corresponder a ninguna zona horaria; exporta en UTC o en hora local sin desfase.")
+        return tiempos.dt.tz_convert(self.zona) if self.zona is not None else tiempos
+
+
+def _primeras_filas(fuente, nombre: str, n_filas: int) -> list:
+    """Primeras filas de cada hoja (una sola lista en CSV); la serie se lee de la primera, el perfil de cualquiera."""
+    _rebobinar(fuente)
+    if _es_csv(nombre):
+        if isinstance(fuente, (str, bytes)) or hasattr(fuente, '__fspath__'):
+            with open(fuente, 'rb') as f: crudo = b''.join(f.readline() for _ in range(n_filas))
+        else: crudo = b''.join(fuente.readline() for _ in range(n_filas))
+        texto = crudo.decode('utf-8-sig', errors='replace') if isinstance(crudo, bytes) else crudo
+        hojas = [list(csv.reader(io.StringIO(texto)))]
+    else:
+        from openpyxl import load_workbook
+        libro = load_workbook(fuente, read_only=True, data_only=True)
+        try: hojas = [[list(f) for f in hoja.iter_rows(max_row=n_filas, values_only=True)] for hoja in libro.worksheets]
+        finally: libro.close()
+    _rebobinar(fuente)
+    return hojas
+
+
+def detectar_formato(fuente, nombre: str = None, n_filas: int = FILAS_DETECCION) -> Deteccion:
+    """Clasifica el archivo mirando solo el encabezado y las primeras filas.
+
+    Devuelve `Deteccion(TIPO_SERIE)` para series de tiempo, `Deteccion(TIPO_PERFIL, fila_encabezado=i)` para
+    hojas de perfil de carga (encabezado 'Carga'/'Potencia (W)' en la fila i) o `TIPO_DESCONOCIDO` con el motivo.
+    """
+    nombre = _nombre_de(fuente, nombre)
+    if not (_es_csv(nombre) or nombre.lower().endswith('.xlsx')):
+        return Deteccion(TIPO_DESCONOCIDO, f"Extensión no soportada: '{nombre}' (usa .csv o .xlsx).")
+    try: hojas = _primeras_filas(fuente, nombre, n_filas)
+    except Exception as e: return Deteccion(TIPO_DESCONOCIDO, f"No se pudo abrir el archivo: {e}")
+    if not any(hojas): return Deteccion(TIPO_DESCONOCIDO, "El archivo está vacío.")
+    filas = hojas[0] or [[]]
+    ts_col, p_col = elegir_columnas([c for c in filas[0] if c is not None])
+    if ts_col and p_col:
+        i_ts = [str(c).lower().strip() if c is not None else '' for c in filas[0]].index(str(ts_col).lower().strip())
+        muestra = pd.Series([f[i_ts] for f in filas[1:] if len(f) > i_ts])
+        formato = adivinar_formato_fecha(muestra)
+        fechas = pd.to_datetime(muestra, format=formato, errors='coerce', utc=bool(formato) and '%z' in formato)
+        if len(muestra) and fechas.isna().all():
+            return Deteccion(TIPO_DESCONOCIDO, f"La columna '{ts_col}' no contiene fechas reconocibles en las primeras filas.")
+        return Deteccion(TIPO_SERIE)
+    # Como `leer_perfil_carga`, el perfil puede estar en cualquier hoja (p. ej. tras una portada)
+    for hoja in hojas:
+        for i, fila in enumerate(hoja):
+            if _es_encabezado_perfil(fila): return Deteccion(TIPO_PERFIL, fila_encabezado=i)
+    if ts_col or p_col:
+        falta = 'potencia (' + ', '.join(COLUMNAS_POTENCIA) + ')' if ts_col else 'fecha (' + ', '.join(COLUMNAS_TIEMPO) + ')'
+        return Deteccion(TIPO_DESCONOCIDO, f"Serie de tiempo sin columna de {falta}.")
+    return Deteccion(TIPO_DESCONOCIDO, f"No se encontraron columnas de fecha/potencia ni el encabezado {' / '.join(repr(c) for c in COLUMNAS_PERFIL)} en las primeras {n_filas} filas de ninguna hoja.")
+
+
+def intervalo_nativo(tiempos: pd.Series) -> pd.Timedelta:
+    """Intervalo de muestreo: el mayor divisor de la hora que no supera la mediana de los pasos (1 h como máximo)."""
+    marcas = np.unique(tiempos.dropna().to_numpy(dtype='datetime64[ns]').view(np.int64))
+    if len(marcas) < 2: return pd.Timedelta(hours=1)
+    paso_min = float(np.median(np.diff(marcas))) / 6e10
+    return pd.Timedelta(minutes=max([m for m in INTERVALOS_MIN if m <= paso_min] or [INTERVALOS_MIN[0]]))
+
+
+class AcumuladorIntervalo:
+    """Suma y cuenta muestras de potencia por intervalo; la memoria depende de los intervalos cubiertos, no de las filas."""
+
+    def __init__(self, intervalo='h', max_parciales: int = 32):
+        self.intervalo = None if intervalo is None else pd.Timedelta(pd.tseries.frequencies.to_offset(intervalo))
+        self._parciales = []
+        self._max_parciales = max_parciales
+        self.filas = 0
+
+    def agregar(self, tiempos: pd.Series, potencia: pd.Series):
+        validos = tiempos.notna().to_numpy() & potencia.notna().to_numpy()
+        self.filas += len(tiempos)
+        if not validos.any(): return
+        marcas = self._piso(tiempos[validos])
+        valores = potencia[validos].to_numpy(dtype='float64')
+        parcial = pd.DataFrame({'suma': valores, 'cuenta': 1}, index=marcas.rename('Timestamp')).groupby(level=0).sum()
+        self._parciales.append(parcial)
+        if len(self._parciales) >= self._max_parciales: self._compactar()
+
+    def _piso(self, tiempos: pd.Series) -> pd.DatetimeIndex:
+        """Inicio del intervalo de cada marca según la hora local; con zona se resta el resto local al instante
+        (así la hora repetida del cambio de horario no es ambigua)."""
+        if tiempos.dt.tz is None: return pd.DatetimeIndex(tiempos.dt.floor(self.intervalo))
+        locales = tiempos.dt.tz_localize(None)
+        marcas = pd.DatetimeIndex(tiempos - (locales - locales.dt.floor(self.intervalo)))
+        if self._parciales and self._parciales[0].index.tz != marcas.tz:  # la zona se redefinió en este bloque
+            self._parciales = [p.tz_convert(marcas.tz) for p in self._parciales]
+        return marcas
+
+    def _compactar(self):
+        if len(self._parciales) > 1: self._parciales = [pd.concat(self._parciales).groupby(level=0).sum()]
+
+    def resultado(self) -> pd.DataFrame:
+        """Potencia media float32 por intervalo, con huecos rellenados hacia adelante; el intervalo queda en `index.freq`."""
+        self._compactar()
+        if not self._parciales: return pd.DataFrame({'Potencia_kW': np.array([], dtype=np.float32)}, index=pd.DatetimeIndex([], name='Timestamp'))
+        total = self._parciales[0].sort_index()
+        df = pd.DataFrame({'Potencia_kW': (total['suma'] / total['cuenta']).astype(np.float32)})
+        return df.asfreq(self.intervalo).ffill()
+
+
+def _bloques_csv(fuente, tam_bloque: int):
+    yield from pd.read_csv(fuente, chunksize=tam_bloque, usecols=lambda c: str(c).lower().strip() in COLUMNAS_TIEMPO + COLUMNAS_POTENCIA)
+
+
+def _bloques_xlsx(fuente, tam_bloque: int):
+    from openpyxl import load_workbook
+    libro = load_workbook(fuente, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None: return
+        encabezado = [str(c) if c is not None else f'_col{i}' for i, c in enumerate(encabezado)]
+        bloque = []
+        for fila in filas:
+            bloque.append(fila)
+            if len(bloque) >= tam_bloque: yield pd.DataFrame(bloque, columns=encabezado); bloque = []
+        if bloque: yield pd.DataFrame(bloque, columns=encabezado)
+    finally:
+        libro.close()
+
+
+def _tamano(fuente):
+    """Bytes totales de un archivo abierto (para estimar el avance con `tell`), o None si no se puede saber."""
+    if not (hasattr(fuente, 'seek') and hasattr(fuente, 'tell')): return None
+    fuente.seek(0, io.SEEK_END); total = fuente.tell(); fuente.seek(0)
+    return total or None
+
+
+def leer_serie_por_bloques(fuente, nombre: str = None, formato_fecha: str = None, tam_bloque: int = TAM_BLOQUE, progreso=None, intervalo=None) -> pd.DataFrame:
+    """Lee una serie de tiempo por bloques a su resolución nativa (columna float32 'Potencia_kW', intervalo en `index.freq`).
+
+    `fuente` puede ser una ruta o un archivo binario abierto. Las fechas se interpretan con `formato_fecha`
+    (o con el formato inferido del primer bloque); con desfase UTC quedan en la zona que lo reproduce (`LectorFechas`). El intervalo se deduce del primer bloque (divisor de la hora,
+    1 h como máximo) salvo que se pase `intervalo` (p. ej. 'h' para promediar por hora). Si la mediana supera 1000 se asume W y se pasa a kW
+    (marcado en `df.attrs['convertido_w']`). Lanza `FormatoNoReconocido` si faltan columnas o no hay datos válidos.
+    `progreso(filas=, bloques=, fraccion=)` se llama tras cada bloque; la fracción solo se informa en CSV abiertos.
+    """
+    nombre = _nombre_de(fuente, nombre); _rebobinar(fuente)
+    total = _tamano(fuente) if progreso is not None and _es_csv(nombre) else None
+    bloques = _bloques_csv(fuente, tam_bloque) if _es_csv(nombre) else _bloques_xlsx(fuente, tam_bloque)
+    acumulador = AcumuladorIntervalo(intervalo)
+    ts_col = p_col = lector = None
+    for n_bloque, bloque in enumerate(bloques, 1):
+        if ts_col is None:
+            ts_col, p_col = elegir_columnas(bloque.columns)
+            if not ts_col or not p_col: raise FormatoNoReconocido("Faltan columnas de fecha y/o potencia.")
+            if formato_fecha is None: formato_fecha = adivinar_formato_fecha(bloque[ts_col])
+            lector = LectorFechas(formato_fecha)
+        tiempos = lector.convertir(bloque[ts_col])
+        if acumulador.intervalo is None: acumulador.intervalo = intervalo_nativo(tiempos)
+        acumulador.agregar(tiempos, pd.to_numeric(bloque[p_col], errors='coerce'))
+        if progreso is not None: progreso(filas=acumulador.filas, bloques=n_bloque, fraccion=fuente.tell() / total if total else None)
+    if ts_col is None: raise FormatoNoReconocido("El archivo no tiene filas de datos.")
+    df = acumulador.resultado()
+    if df.empty: raise FormatoNoReconocido(f"Ninguna fila con fecha ('{ts_col}') y potencia ('{p_col}') válidas.")
+    df.attrs['convertido_w'] = bool(df['Potencia_kW'].median() > 1000)
+    if df.attrs['convertido_w']: df['Potencia_kW'] /= np.float32(1000.0)
+    df.attrs['filas_leidas'] = acumulador.filas
+    return df
+
+
+def _es_encabezado_perfil(fila) -> bool:
+    celdas = {str(c).strip() for c in fila if c is not None}
+    return all(c in celdas for c in COLUMNAS_PERFIL)
+
+
+def _hojas_perfil_xlsx(fuente, n_filas: int = FILAS_DETECCION):
+    """Recorre todas las hojas en modo solo-lectura y devuelve un DataFrame por hoja con encabezado de perfil."""
+    from openpyxl import load_workbook
+    libro = load_workbook(fuente, read_only=True, data_only=True)
+    try:
+        for hoja in libro.worksheets:
+            filas = hoja.iter_rows(values_only=True); encabezado = None
+            for i, fila in enumerate(filas):
+                if i >= n_filas: break
+                if _es_encabezado_perfil(fila): encabezado = fila; break
+            if encabezado is None: continue
+            columnas = [str(c) if c is not None else f'_col{i}' for i, c in enumerate(encabezado)]
+            yield pd.DataFrame([f[:len(columnas)] for f in filas], columns=columnas)
+    finally:
+        libro.close()
+
+
+def inventario_desde_tabla(df_perfil: pd.DataFrame) -> tuple:
+    """Convierte la tabla de cargas en arrays (nombres, potencia_kw, matriz_horas (n, 24)) sin recorrer filas."""
+    df_perfil = df_perfil.set_axis([str(col).strip().split('.')[0] for col in df_perfil.columns], axis=1)
+    df_perfil = df_perfil.loc[:, ~df_perfil.columns.duplicated()]
+    if not all(c in df_perfil.columns for c in COLUMNAS_PERFIL): raise FormatoNoReconocido("Faltan columnas 'Carga' / 'Potencia (W)'.")
+    horas = np.zeros((len(df_perfil), 24), dtype=bool)
+    hourly_cols = [str(i) for i in range(24) if str(i) in df_perfil.columns]
+    if hourly_cols: horas[:, [int(h) for h in hourly_cols]] = df_perfil[hourly_cols].apply(pd.to_numeric, errors='coerce').eq(1).to_numpy()
+    potencia_w = pd.to_numeric(df_perfil['Potencia (W)'], errors='coerce')
+    validos = (df_perfil['Carga'].notna() & potencia_w.notna() & potencia_w.ne(0)).to_numpy() & horas.any(axis=1)
+    return df_perfil['Carga'].to_numpy()[validos], potencia_w.to_numpy(dtype='float64')[validos] / 1000.0, horas[validos]
+
+
+def leer_inventario_perfil(fuente, nombre: str = None, fila_encabezado: int = 7) -> tuple:
+    """Lee la hoja de perfil de carga (CSV, o todas las hojas de un XLSX en modo streaming) como arrays de inventario."""
+    nombre = _nombre_de(fuente, nombre); _rebobinar(fuente)
+    if _es_csv(nombre): tablas = [pd.read_csv(fuente, skiprows=fila_encabezado)]
+    else: tablas = list(_hojas_perfil_xlsx(fuente))
+    if not tablas: raise FormatoNoReconocido("Ninguna hoja contiene el encabezado 'Carga' / 'Potencia (W)'.")
+    partes = [inventario_desde_tabla(t) for t in tablas]
+    return tuple(np.concatenate([p[i] for p in partes]) for i in range(3))
+
+
+def leer_perfil_carga(fuente, nombre: str = None, fila_encabezado: int = 7, year: int = None) -> pd.DataFrame:
+    """Perfil horario anual 'Potencia_kW' a partir de una hoja de perfil de carga (uso 7 días/semana)."""
+    nombres, potencia_kw, horas = leer_inventario_perfil(fuente, nombre, fila_encabezado)
+    if len(nombres) == 0: raise FormatoNoReconocido("Archivo leído, sin cargas con potencia y horas de uso válidas.")
+    plantilla = plantilla_desde_arrays(potencia_kw, np.full(len(nombres), 7), horas)
+    return generar_perfil_desde_plantilla(plantilla, year if year is not None else pd.Timestamp.today().year)
+
+
+def cargar_medidor(fuente, nombre: str = None, year: int = None) -> pd.DataFrame:
+    """Detecta el formato y usa el único lector correspondiente; lanza `FormatoNoReconocido` con el motivo."""
+    deteccion = detectar_formato(fuente, nombre)
+    if deteccion.tipo == TIPO_SERIE: return leer_serie_por_bloques(fuente, nombre)
+    if deteccion.tipo == TIPO_PERFIL: return leer_perfil_carga(fuente, nombre, deteccion.fila_encabezado, year)
+    raise FormatoNoReconocido(deteccion.motivo)
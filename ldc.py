@@ -0,0 +1,100 @@
+# ldc.py
+"""Curva de duración de carga (LDC) a partir de sketches logarítmicos, sin ordenar la serie completa."""
+import numpy as np
+import pandas as pd
+from analisis import CuboAgregado, CLAVE_CERO, claves_sketch, rango_claves, valor_de_clave
+
+PUNTOS_LDC = 201
+
+
+def _histograma(claves: np.ndarray) -> tuple:
+    clave_min, _ = rango_claves(claves)
+    return clave_min, np.bincount(claves - clave_min) if len(claves) else np.zeros(0, dtype=np.int64)
+
+
+def _sumar_conteos(clave_a: int, conteos_a: np.ndarray, clave_b: int, conteos_b: np.ndarray) -> tuple:
+    """Suma dos histogramas de claves contiguas que empiezan en claves distintas; devuelve (clave mínima, conteos)."""
+    if not len(conteos_b): return clave_a, conteos_a
+    if not len(conteos_a): return clave_b, conteos_b.astype(np.int64)
+    nuevo_min = min(clave_a, clave_b)
+    nuevo_max = max(clave_a + len(conteos_a), clave_b + len(conteos_b))
+    total = np.zeros(nuevo_max - nuevo_min, dtype=np.int64)
+    total[clave_a - nuevo_min:clave_a - nuevo_min + len(conteos_a)] += conteos_a
+    total[clave_b - nuevo_min:clave_b - nuevo_min + len(conteos_b)] += conteos_b
+    return nuevo_min, total
+
+
+class SketchLDC:
+    """Histograma de cubetas logarítmicas (error relativo <= ALFA_SKETCH) que se llena por bloques y se fusiona.
+
+    Guarda además el pico, el mínimo, la suma y la cuenta exactos. Los valores negativos (exportación neta) se
+    cuentan en un histograma aparte de la magnitud. Dos sketches de medidores distintos se combinan con
+    `fusionar` porque comparten la misma rejilla de claves.
+    """
+
+    def __init__(self):
+        self.conteos = np.zeros(0, dtype=np.int64); self.clave_min = 0
+        self.conteos_neg = np.zeros(0, dtype=np.int64); self.clave_min_neg = 0
+        self.ceros = 0; self.n = 0; self.suma = 0.0
+        self.maximo = -np.inf; self.minimo = np.inf
+
+    def agregar(self, valores) -> 'SketchLDC':
+        valores = np.asarray(valores, dtype='float64'); valores = valores[~np.isnan(valores)]
+        if not len(valores): return self
+        claves = claves_sketch(valores); con_clave = claves != CLAVE_CERO
+        self.ceros += int((~con_clave).sum()); self.n += len(valores); self.suma += float(valores.sum())
+        self.maximo = max(self.maximo, float(valores.max())); self.minimo = min(self.minimo, float(valores.min()))
+        self.clave_min, self.conteos = _sumar_conteos(self.clave_min, self.conteos, *_histograma(claves[con_clave & (valores > 0)]))
+        self.clave_min_neg, self.conteos_neg = _sumar_conteos(self.clave_min_neg, self.conteos_neg, *_histograma(claves[con_clave & (valores < 0)]))
+        return self
+
+    def fusionar(self, otro: 'SketchLDC') -> 'SketchLDC':
+        self.clave_min, self.conteos = _sumar_conteos(self.clave_min, self.conteos, otro.clave_min, otro.conteos)
+        self.clave_min_neg, self.conteos_neg = _sumar_conteos(self.clave_min_neg, self.conteos_neg, otro.clave_min_neg, otro.conteos_neg)
+        self.ceros += otro.ceros; self.n += otro.n; self.suma += otro.suma
+        self.maximo = max(self.maximo, otro.maximo); self.minimo = min(self.minimo, otro.minimo)
+        return self
+
+    @property
+    def media(self) -> float: return self.suma / self.n if self.n else 0.0
+
+    def curva(self, n_puntos: int = PUNTOS_LDC) -> pd.DataFrame:
+        valores = np.concatenate([[0.0], valor_de_clave(np.arange(len(self.conteos)) + self.clave_min), -valor_de_clave(np.arange(len(self.conteos_neg)) + self.clave_min_neg)])
+        conteos = np.concatenate([[self.ceros], self.conteos, self.conteos_neg])
+        return curva_desde_cubetas(valores, conteos, self.maximo, self.minimo, n_puntos)
+
+
+def curva_desde_cubetas(valores, conteos, pico: float, minimo: float, n_puntos: int = PUNTOS_LDC) -> pd.DataFrame:
+    """LDC de tamaño fijo ('Porcentaje_Tiempo', 'Potencia_kW') desde pares (valor de cubeta, cuenta).
+
+    Solo se ordenan las cubetas (cientos/miles), no las muestras; el primer punto es el pico exacto y el último,
+    el mínimo exacto.
+    """
+    valores = np.asarray(valores, dtype='float64').ravel(); conteos = np.asarray(conteos).ravel()
+    usados = conteos > 0; valores, conteos = valores[usados], conteos[usados]
+    n = int(conteos.sum())
+    if n == 0: return pd.DataFrame({'Porcentaje_Tiempo': [], 'Potencia_kW': []})
+    orden = np.argsort(-valores, kind='stable'); valores, acumulado = valores[orden], np.cumsum(conteos[orden])
+    pct = np.linspace(0, 100, n_puntos)
+    rango = np.maximum(1, np.ceil(pct / 100 * n)).astype(np.int64)
+    potencia = np.clip(valores[np.searchsorted(acumulado, rango)], minimo, pico)
+    potencia[-1] = minimo; potencia[0] = pico
+    return pd.DataFrame({'Porcentaje_Tiempo': pct, 'Potencia_kW': potencia})
+
+
+def ldc_desde_cubo(cubo: CuboAgregado, factores: np.ndarray, pico: float, n_puntos: int = PUNTOS_LDC) -> pd.DataFrame:
+    """LDC anual de la serie ajustada: cada hora escala sus cubetas por su factor, sin reconstruir la serie.
+
+    Los factores son >= 0, así que el mínimo ajustado de cada hora es su mínimo original por el factor.
+    """
+    conteos_h = cubo.sketch  # (24, K)
+    valores_h = factores[:, None] * cubo.valores_sketch()[None, :]
+    horas = cubo.cuenta_hora > 0
+    minimo = float((factores * cubo.minimo_hora)[horas].min()) if horas.any() else 0.0
+    return curva_desde_cubetas(valores_h, conteos_h, pico, minimo, n_puntos)
+
+
+def ldc_exacta(valores) -> pd.DataFrame:
+    """LDC ordenando todos los valores; solo para series cortas como el perfil diario de 24 h."""
+    s_sorted = pd.Series(valores).sort_values(ascending=False).reset_index(drop=True); pct_tiempo = (np.arange(1, len(s_sorted) + 1) / len(s_sorted)) * 100
+    return pd.DataFrame({'Potencia_kW': s_sorted, 'Porcentaje_Tiempo': pct_tiempo})
@@ -0,0 +1,109 @@
+# lote.py
+"""Procesamiento por lotes de archivos de medidores: métricas y perfiles ajustados en un único Parquet.
+
+Uso:
+    python lote.py CARPETA_O_MANIFIESTO -o resultados.parquet [--workers N] [--escenario "Normal"]
+                   [--reparto 50] [--diurno 06:00-18:00] [--serie-completa] [--reportes CARPETA]
+
+El manifiesto es un CSV con columna 'ruta' (y opcionalmente 'medidor'); una carpeta se recorre buscando
+*.csv y *.xlsx. Cada archivo se procesa en un proceso del pool, así el tiempo escala con los núcleos.
+"""
+import argparse
+import os
+import sys
+import time as reloj
+from concurrent.futures import ProcessPoolExecutor
+from datetime import time
+from glob import glob
+import numpy as np
+import pandas as pd
+from analisis import ESCENARIOS, ajustar_serie, resumen_medidor
+from ingesta import cargar_medidor
+from reportes import generar_reporte_pdf
+
+
+def listar_medidores(entrada: str) -> pd.DataFrame:
+    """DataFrame (medidor, ruta) desde una carpeta o un manifiesto CSV."""
+    if os.path.isdir(entrada):
+        rutas = sorted(glob(os.path.join(entrada, '**', '*.csv'), recursive=True) + glob(os.path.join(entrada, '**', '*.xlsx'), recursive=True))
+        return pd.DataFrame({'medidor': [os.path.splitext(os.path.relpath(r, entrada))[0] for r in rutas], 'ruta': rutas})
+    manifiesto = pd.read_csv(entrada)
+    if 'ruta' not in manifiesto.columns: raise ValueError("El manifiesto necesita una columna 'ruta'.")
+    base = os.path.dirname(os.path.abspath(entrada))
+    rutas = [r if os.path.isabs(r) else os.path.join(base, r) for r in manifiesto['ruta'].astype(str)]
+    medidores = manifiesto['medidor'].astype(str) if 'medidor' in manifiesto.columns else [os.path.splitext(os.path.basename(r))[0] for r in rutas]
+    return pd.DataFrame({'medidor': list(medidores), 'ruta': rutas})
+
+
+def procesar_medidor(tarea: tuple) -> dict:
+    """Trabajo de un proceso del pool: carga, ajusta y resume un medidor. Los errores quedan en la columna 'error'."""
+    medidor, ruta, escenario, porcentaje, inicio, fin, serie_completa, carpeta_reportes = tarea
+    t0 = reloj.perf_counter()
+    try:
+        df = cargar_medidor(ruta)
+        fila = resumen_medidor(df, escenario, porcentaje, inicio, fin)
+        factores = fila.pop('factores')
+        if serie_completa:
+            fila['inicio_serie'] = df.index[0]
+            fila['serie_kw'] = ajustar_serie(df, factores)['Potencia_kW'].to_numpy(dtype='float32')
+        if carpeta_reportes:
+            perfil = pd.DataFrame({'Hora': range(24), 'Potencia_kW': [fila[f'kw_h{h:02d}'] for h in range(24)]}).dropna()
+            ruta_pdf = os.path.join(carpeta_reportes, f"{medidor.replace(os.sep, '_')}.pdf")
+            with open(ruta_pdf, 'wb') as f: f.write(generar_reporte_pdf(fila, perfil))
+            fila['reporte'] = ruta_pdf
+        fila['error'] = None
+    except Exception as e:
+        fila = {'error': f"{type(e).__name__}: {e}"}
+    fila.update(medidor=medidor, ruta=ruta, segundos=reloj.perf_counter() - t0)
+    return fila
+
+
+def procesar_lote(medidores: pd.DataFrame, escenario: str = "Normal", porcentaje: float = 50, inicio: time = time(6, 0), fin: time = time(18, 0),
+                  workers: int = None, serie_completa: bool = False, carpeta_reportes: str = None) -> pd.DataFrame:
+    if carpeta_reportes: os.makedirs(carpeta_reportes, exist_ok=True)
+    tareas = [(m, r, escenario, porcentaje, inicio, fin, serie_completa, carpeta_reportes) for m, r in zip(medidores['medidor'], medidores['ruta'])]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1: filas = [procesar_medidor(t) for t in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool: filas = list(pool.map(procesar_medidor, tareas, chunksize=max(1, len(tareas) // (workers * 8))))
+    df = pd.DataFrame(filas)
+    primeras = ['medidor', 'ruta', 'error']
+    return df[primeras + [c for c in df.columns if c not in primeras]]
+
+
+def escribir_parquet(df: pd.DataFrame, salida: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    tabla = pa.Table.from_pandas(df.drop(columns=['serie_kw'], errors='ignore'), preserve_index=False)
+    if 'serie_kw' in df.columns: tabla = tabla.append_column('serie_kw', pa.array([v if isinstance(v, np.ndarray) else None for v in df['serie_kw']], type=pa.list_(pa.float32())))
+    pq.write_table(tabla, salida, compression='zstd')
+
+
+def _ventana(texto: str) -> tuple:
+    inicio, fin = texto.split('-')
+    return tuple(time.fromisoformat(t.strip()) for t in (inicio, fin))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Analiza muchos archivos de medidores en paralelo.")
+    parser.add_argument('entrada', help="Carpeta con CSV/XLSX o manifiesto CSV con columna 'ruta'.")
+    parser.add_argument('-o', '--salida', default='resultados_lote.parquet')
+    parser.add_argument('--workers', type=int, default=None, help="Procesos (por defecto, todos los núcleos).")
+    parser.add_argument('--escenario', default="Normal", choices=list(ESCENARIOS))
+    parser.add_argument('--reparto', type=float, default=50, help="Reparto diurno (%%).")
+    parser.add_argument('--diurno', type=_ventana, default=(time(6, 0), time(18, 0)), help="Horario diurno HH:MM-HH:MM.")
+    parser.add_argument('--serie-completa', action='store_true', help="Incluye la serie horaria ajustada (float32) por medidor.")
+    parser.add_argument('--reportes', default=None, help="Carpeta donde escribir un PDF de perfil diario por medidor.")
+    args = parser.parse_args(argv)
+    medidores = listar_medidores(args.entrada)
+    if medidores.empty: print("No se encontraron archivos.", file=sys.stderr); return 1
+    t0 = reloj.perf_counter()
+    df = procesar_lote(medidores, args.escenario, args.reparto, *args.diurno, workers=args.workers, serie_completa=args.serie_completa, carpeta_reportes=args.reportes)
+    escribir_parquet(df, args.salida)
+    errores = int(df['error'].notna().sum())
+    print(f"{len(df)} medidores en {reloj.perf_counter() - t0:.1f} s ({errores} con error) -> {args.salida}")
+    return 0 if errores < len(df) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# perfiles.py
+"""Generación de perfiles horarios a partir de inventarios de cargas mediante una plantilla semanal (7 días x 24 h)."""
+import numpy as np
+import pandas as pd
+
+DIAS_SEMANA = 7
+HORAS_DIA = 24
+MESES = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+
+
+def _plantilla_semanal(laborable, sabado, domingo) -> np.ndarray:
+    return np.array([laborable] * 5 + [sabado, domingo], dtype='float64')
+
+
+# Formas semanales típicas (7, 24) en unidades relativas; solo importa la forma, la escala la dan las facturas.
+_RESIDENCIAL_LAB = [.35, .30, .28, .27, .28, .35, .55, .75, .65, .50, .45, .45, .50, .50, .45, .45, .55, .75, .95, 1.0, .95, .80, .60, .45]
+_RESIDENCIAL_FDS = [.40, .33, .30, .28, .28, .30, .38, .50, .65, .70, .65, .62, .65, .62, .55, .52, .58, .75, .92, 1.0, .95, .82, .65, .50]
+_COMERCIAL_LAB = [.20, .20, .20, .20, .20, .25, .40, .70, .95, 1.0, 1.0, 1.0, .95, 1.0, 1.0, 1.0, .95, .85, .55, .35, .25, .22, .20, .20]
+PLANTILLAS_TIPICAS = {
+    "Residencial": _plantilla_semanal(_RESIDENCIAL_LAB, _RESIDENCIAL_FDS, _RESIDENCIAL_FDS),
+    "Comercial": _plantilla_semanal(_COMERCIAL_LAB, [.2 + .5 * (v - .2) for v in _COMERCIAL_LAB], [.20] * HORAS_DIA),
+    "Plana": np.ones((DIAS_SEMANA, HORAS_DIA)),
+}
+
+
+def plantilla_desde_arrays(potencia_kw, dias_por_semana, matriz_horas) -> np.ndarray:
+    """Suma todas las cargas en una plantilla (7, 24) de kW en una sola operación.
+
+    `potencia_kw` y `dias_por_semana` tienen forma (n,); `matriz_horas` es booleana (n, 24). Cada carga se usa
+    los primeros `dias_por_semana` días (0 = lunes). Las cargas se acumulan en orden, igual que un bucle.
+    """
+    potencia_kw = np.asarray(potencia_kw, dtype='float64')
+    dias = np.arange(DIAS_SEMANA) < np.asarray(dias_por_semana)[:, None]
+    mascara = dias[:, :, None] & np.asarray(matriz_horas, dtype=bool)[:, None, :]
+    i, d, h = np.nonzero(mascara)
+    plantilla = np.zeros((DIAS_SEMANA, HORAS_DIA))
+    np.add.at(plantilla, (d, h), potencia_kw[i])
+    return plantilla
+
+
+def plantilla_desde_items(items: list) -> np.ndarray:
+    """Plantilla semanal para una lista de electrodomésticos con el formato de `st.session_state.electrodomesticos`."""
+    potencia_kw = [(item['potencia_w'] * item['cantidad']) / 1000.0 for item in items]
+    matriz_horas = np.zeros((len(items), HORAS_DIA), dtype=bool)
+    for fila, item in enumerate(items): matriz_horas[fila, list(item['horas_de_uso'])] = True
+    return plantilla_desde_arrays(potencia_kw, [item['dias_por_semana'] for item in items], matriz_horas)
+
+
+def indice_anual(years) -> pd.DatetimeIndex:
+    """Índice horario continuo que cubre uno o varios años completos."""
+    years = sorted({int(y) for y in np.atleast_1d(years)})
+    rangos = [pd.date_range(start=f'{y}-01-01 00:00', end=f'{y}-12-31 23:00', freq='h') for y in years]
+    idx = rangos[0] if len(rangos) == 1 else pd.DatetimeIndex(np.concatenate([r.values for r in rangos]))
+    idx.name = 'Timestamp'
+    return idx
+
+
+def proyectar_plantillas(plantillas: np.ndarray, idx: pd.DatetimeIndex) -> np.ndarray:
+    """Proyecta plantillas (..., 7, 24) sobre el índice; devuelve (len(idx), ...) sin bucles por hora."""
+    valores = plantillas[..., idx.dayofweek, idx.hour]
+    return np.moveaxis(valores, -1, 0)
+
+
+def generar_perfil_desde_plantilla(plantilla: np.ndarray, year) -> pd.DataFrame:
+    """Perfil 'Potencia_kW' de una plantilla (7, 24) para uno o varios años."""
+    idx = indice_anual(year)
+    return pd.DataFrame({'Potencia_kW': proyectar_plantillas(plantilla, idx)}, index=idx)
+
+
+def generar_perfil(items: list, year) -> pd.DataFrame:
+    """Perfil 'Potencia_kW' de un inventario para uno o varios años."""
+    return generar_perfil_desde_plantilla(plantilla_desde_items(items), year)
+
+
+def desagregar_facturas(kwh_mensual, plantillas, year: int) -> tuple:
+    """Perfiles horarios (T, C) float32 que reproducen exactamente los kWh mensuales de C clientes.
+
+    `kwh_mensual` es (C, 12) y `plantillas` (C, 7, 24) o una sola (7, 24). Cada mes escala la forma semanal de
+    su cliente: la energía de la plantilla en el mes se calcula en forma cerrada (días de cada día de semana x
+    energía diaria de la plantilla), sin recorrer horas. Meses NaN se rellenan con la media del cliente.
+    Devuelve (índice horario del año, valores).
+    """
+    kwh = np.atleast_2d(np.asarray(kwh_mensual, dtype='float64'))
+    medias = np.nanmean(np.where(np.isnan(kwh).all(axis=1, keepdims=True), 0.0, kwh), axis=1, keepdims=True)
+    kwh = np.where(np.isnan(kwh), medias, kwh)
+    plantillas = np.broadcast_to(np.asarray(plantillas, dtype='float64'), (len(kwh), DIAS_SEMANA, HORAS_DIA))
+    plantillas = np.where(plantillas.sum(axis=(1, 2), keepdims=True) > 0, plantillas, 1.0)  # plantilla vacía -> plana
+    idx = indice_anual(year)
+    dias = pd.date_range(f'{int(year)}-01-01', f'{int(year)}-12-31', freq='D')
+    n_dias = np.zeros((12, DIAS_SEMANA)); np.add.at(n_dias, (dias.month - 1, dias.dayofweek), 1)       # (12, 7)
+    energia_plantilla = plantillas.sum(axis=2) @ n_dias.T                                             # (C, 12)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        escala = np.where(energia_plantilla > 0, kwh / energia_plantilla, 0.0)                        # (C, 12)
+    valores = proyectar_plantillas(plantillas.astype(np.float32), idx)                                # (T, C)
+    valores *= escala.T.astype(np.float32)[idx.month - 1]
+    return idx, valores
+
+
+def columnas_meses(tabla: pd.DataFrame) -> list:
+    """Las 12 columnas de meses de una tabla de facturas: 'Ene'..'Dic' (o nombres que empiecen así) o 1..12."""
+    por_nombre = {str(c).strip().lower()[:3]: c for c in tabla.columns}
+    columnas = [por_nombre.get(m.lower()) for m in MESES]
+    if None in columnas: columnas = [por_nombre.get(str(i)) for i in range(1, 13)]
+    if None in columnas: raise ValueError("La tabla de facturas necesita 12 columnas de meses (Ene..Dic o 1..12).")
+    return columnas
+
+
+def perfiles_desde_facturas(tabla: pd.DataFrame, year: int, plantilla: str = "Residencial") -> pd.DataFrame:
+    """Perfiles horarios de todos los clientes de una tabla de facturas en una pasada (una columna por cliente).
+
+    Columnas: 12 meses (ver `columnas_meses`), 'cliente' opcional y 'plantilla' opcional por fila (nombre de
+    `PLANTILLAS_TIPICAS`; si falta o no existe se usa `plantilla`).
+    """
+    kwh = tabla[columnas_meses(tabla)].apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64')
+    nombres = tabla['cliente'].astype(str).tolist() if 'cliente' in tabla.columns else [f"Cliente {i + 1}" for i in range(len(tabla))]
+    tipos = tabla['plantilla'].astype(str).tolist() if 'plantilla' in tabla.columns else [plantilla] * len(tabla)
+    catalogo = list(PLANTILLAS_TIPICAS); apiladas = np.stack([PLANTILLAS_TIPICAS[n] for n in catalogo])
+    codigos = np.array([catalogo.index(t) if t in PLANTILLAS_TIPICAS else catalogo.index(plantilla) for t in tipos], dtype=np.int64)
+    idx, valores = desagregar_facturas(kwh, apiladas[codigos], year)
+    return pd.DataFrame(valores, index=idx, columns=nombres)
+
+
+def perfil_desde_factura(kwh_mensual, year: int, plantilla) -> pd.DataFrame:
+    """Perfil 'Potencia_kW' de un cliente; `plantilla` es un nombre de `PLANTILLAS_TIPICAS` o un arreglo (7, 24)."""
+    forma = PLANTILLAS_TIPICAS[plantilla] if isinstance(plantilla, str) else plantilla
+    idx, valores = desagregar_facturas([kwh_mensual], forma, year)
+    return pd.DataFrame({'Potencia_kW': valores[:, 0]}, index=idx)
+
+
+def generar_perfiles(inventarios: dict, years) -> pd.DataFrame:
+    """Perfiles de varios edificios a la vez: una columna de kW por edificio (clave del dict) y filas por hora."""
+    nombres = list(inventarios)
+    plantillas = np.stack([plantilla_desde_items(inventarios[n]) for n in nombres]) if nombres else np.zeros((0, DIAS_SEMANA, HORAS_DIA))
+    idx = indice_anual(years)
+    return pd.DataFrame(proyectar_plantillas(plantillas, idx), index=idx, columns=nombres)
@@ -0,0 +1,93 @@
+# reportes.py
+"""Reportes PDF con gráficos dibujados por matplotlib (Agg), sin lanzar un navegador por imagen como kaleido.
+
+Los gráficos usan una figura reutilizable por hilo y un estilo fijo. Para muchos reportes, `lote.py --reportes`
+genera cada PDF dentro del proceso que ya analiza su medidor.
+"""
+import threading
+from datetime import date
+import pandas as pd
+from fpdf import FPDF
+from PIL import Image
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Estilo equivalente al template "plotly_dark" usado en la app.
+ESTILO = {'fondo': '#111111', 'texto': '#f2f5fa', 'rejilla': '#283442', 'serie': '#636efa', 'dpi': 100, 'escala': 2}
+_local = threading.local()
+
+
+def _figura(ancho_px: int, alto_px: int) -> Figure:
+    """Figura Agg reutilizada por hilo y tamaño; se limpia en lugar de recrearse en cada gráfico."""
+    cache = getattr(_local, 'figuras', None)
+    if cache is None: cache = _local.figuras = {}
+    fig = cache.get((ancho_px, alto_px))
+    if fig is None:
+        dpi = ESTILO['dpi'] * ESTILO['escala']
+        fig = Figure(figsize=(ancho_px / ESTILO['dpi'], alto_px / ESTILO['dpi']), dpi=dpi, facecolor=ESTILO['fondo'])
+        FigureCanvasAgg(fig); cache[(ancho_px, alto_px)] = fig
+    fig.clear(); fig.subplots_adjust(left=0.08, right=0.98, top=0.9, bottom=0.12)
+    return fig
+
+
+def _ejes(fig: Figure, titulo: str, eje_x: str, eje_y: str):
+    ax = fig.add_subplot(111, facecolor=ESTILO['fondo'])
+    ax.set_title(titulo, color=ESTILO['texto']); ax.set_xlabel(eje_x, color=ESTILO['texto']); ax.set_ylabel(eje_y, color=ESTILO['texto'])
+    ax.tick_params(colors=ESTILO['texto']); ax.grid(True, color=ESTILO['rejilla'], linewidth=0.8); ax.set_axisbelow(True)
+    for borde in ax.spines.values(): borde.set_visible(False)
+    return ax
+
+
+def _imagen(fig: Figure) -> Image.Image:
+    """Rasteriza la figura a una imagen RGB (sin PNG intermedio ni canal alfa, que fpdf revisa píxel a píxel)."""
+    fig.canvas.draw()
+    return Image.frombuffer('RGBA', fig.canvas.get_width_height(), fig.canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1).convert('RGB')
+
+
+def imagen_perfil_diario(df_perfil_diario: pd.DataFrame, ancho_px: int = 800, alto_px: int = 400) -> Image.Image:
+    fig = _figura(ancho_px, alto_px); ax = _ejes(fig, "Perfil Diario (Línea)", 'Hora', 'kW')
+    ax.plot(df_perfil_diario['Hora'], df_perfil_diario['Potencia_kW'], marker='o', color=ESTILO['serie'])
+    return _imagen(fig)
+
+
+def imagen_barras_mensual(df_factura: pd.DataFrame, ancho_px: int = 800, alto_px: int = 500) -> Image.Image:
+    fig = _figura(ancho_px, alto_px); ax = _ejes(fig, "Consumo Mensual", 'Mes', 'kWh')
+    barras = ax.bar(df_factura['Mes'], df_factura['Consumo (kWh)'], color=ESTILO['serie'])
+    ax.bar_label(barras, fmt='%.1f', color=ESTILO['texto'], padding=2)
+    return _imagen(fig)
+
+
+def generar_reporte_pdf(metrics_diarios: dict, df_perfil_diario: pd.DataFrame, df_tarifas: pd.DataFrame = None) -> bytes:
+    pdf = FPDF()
+    pdf.add_page(); pdf.set_font("Arial", 'B', 16); pdf.cell(0, 10, "Reporte Perfil Consumo Diario", 0, 1, 'C')
+    pdf.set_font("Arial", '', 10); pdf.cell(0, 8, f"Generado: {date.today().strftime('%d/%m/%Y')}", 0, 1, 'C'); pdf.ln(10)
+    pdf.set_font("Arial", 'B', 12); pdf.cell(0, 10, "Métricas Clave (Diarias)", 0, 1, 'L'); pdf.set_font("Arial", '', 11)
+    pdf.cell(95, 8, "Pico Potencia:", 1, 0, 'L'); pdf.cell(95, 8, f"{metrics_diarios['pico_kw_diario']:.2f} kW", 1, 1, 'R')
+    pdf.cell(95, 8, "Prom. Potencia:", 1, 0, 'L'); pdf.cell(95, 8, f"{metrics_diarios['media_kw_diaria']:.2f} kW", 1, 1, 'R')
+    pdf.cell(95, 8, "Consumo Mensual Est.:", 1, 0, 'L'); pdf.cell(95, 8, f"{metrics_diarios['consumo_mensual_kwh']:,.0f} kWh", 1, 1, 'R')
+    pdf.cell(95, 8, "Consumo Anual Est.:", 1, 0, 'L'); pdf.cell(95, 8, f"{metrics_diarios['consumo_anual_kwh']:,.0f} kWh", 1, 1, 'R'); pdf.ln(5)
+    if df_tarifas is not None and not df_tarifas.empty:
+        pdf.set_font("Arial", 'B', 12); pdf.cell(0, 10, "Costo Anual por Tarifa", 0, 1, 'L'); pdf.set_font("Arial", 'B', 10)
+        pdf.cell(100, 8, "Tarifa", 1, 0, 'C'); pdf.cell(45, 8, "Total ($)", 1, 0, 'C'); pdf.cell(45, 8, "Medio ($/kWh)", 1, 1, 'C')
+        pdf.set_font("Arial", '', 10)
+        for nombre, total, medio in zip(df_tarifas['Tarifa'], df_tarifas['Total ($)'], df_tarifas['Costo medio ($/kWh)']):
+            pdf.cell(100, 8, str(nombre)[:50], 1, 0, 'L'); pdf.cell(45, 8, f"{total:,.2f}", 1, 0, 'R'); pdf.cell(45, 8, f"{medio:.4f}", 1, 1, 'R')
+    curva_bytes = imagen_perfil_diario(df_perfil_diario)
+    pdf.add_page(); pdf.set_font("Arial", 'B', 14); pdf.cell(0, 10, "Perfil Consumo Diario Promedio", 0, 1, 'C'); pdf.ln(5); pdf.image(curva_bytes, x=10, w=pdf.w - 20)
+    return bytes(pdf.output())
+
+
+def generar_reporte_factura_pdf(metrics: dict, df_factura: pd.DataFrame) -> bytes:
+    pdf = FPDF()
+    pdf.add_page(); pdf.set_font("Arial", 'B', 16); pdf.cell(0, 10, "Reporte Consumo Factura", 0, 1, 'C')
+    pdf.set_font("Arial", '', 10); pdf.cell(0, 8, f"Generado: {date.today().strftime('%d/%m/%Y')}", 0, 1, 'C'); pdf.ln(10)
+    pdf.set_font("Arial", 'B', 12); pdf.cell(0, 10, "Resumen Anual", 0, 1, 'L'); pdf.set_font("Arial", '', 11)
+    pdf.cell(95, 8, "Total Anual:", 1, 0, 'L'); pdf.cell(95, 8, f"{metrics['total_anual']:.1f} kWh", 1, 1, 'R')
+    pdf.cell(95, 8, "Prom. Mensual:", 1, 0, 'L'); pdf.cell(95, 8, f"{metrics['promedio_mensual']:.1f} kWh", 1, 1, 'R'); pdf.ln(5)
+    pdf.set_font("Arial", 'B', 12); pdf.cell(0, 10, "Detalle Mensual", 0, 1, 'L'); pdf.set_font("Arial", 'B', 10)
+    pdf.cell(95, 8, "Mes", 1, 0, 'C'); pdf.cell(95, 8, "Consumo (kWh)", 1, 1, 'C')
+    pdf.set_font("Arial", '', 10)
+    for mes, kwh in zip(df_factura['Mes'], df_factura['Consumo (kWh)']): pdf.cell(95, 8, mes, 1, 0, 'L'); pdf.cell(95, 8, f"{kwh:.1f}", 1, 1, 'R')
+    factura_bytes = imagen_barras_mensual(df_factura)
+    pdf.add_page(); pdf.set_font("Arial", 'B', 14); pdf.cell(0, 10, "Consumo Anual por Mes", 0, 1, 'C'); pdf.ln(5); pdf.image(factura_bytes, x=10, w=pdf.w - 20)
+    return bytes(pdf.output())
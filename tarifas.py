@@ -0,0 +1,142 @@
+# tarifas.py
+"""Facturación de muchas tarifas a la vez (horarias, bloques, demanda) sobre la serie de potencia.
+
+Una tarifa es un dict:
+    {"nombre": str, "cargo_fijo": $/mes, "precio_kwh_base": $/kWh,
+     "periodos": [{"nombre": str, "dias": [0..6], "horas": [0..23], "precio_kwh": $/kWh}, ...],
+     "bloques": [[limite_kwh_mes | None, recargo $/kWh], ...],   # escalones acumulativos sobre el consumo mensual
+     "cargo_demanda_kw": $/kW sobre el pico mensual}
+Los periodos posteriores prevalecen sobre los anteriores y sobre el precio base.
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+from analisis import CuboAgregado, horas_por_muestra
+
+RUTA_TARIFAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tarifas.json')
+RANURAS_SEMANA = 168  # día de semana x 24 + hora
+
+
+def _numero(valor, donde: str) -> float:
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not np.isfinite(valor):
+        raise ValueError(f"{donde} debe ser un número, no {valor!r}.")
+    return float(valor)
+
+
+def _enteros(valores, donde: str, tope: int) -> list:
+    if not isinstance(valores, list) or not valores or not all(isinstance(v, int) and not isinstance(v, bool) and 0 <= v < tope for v in valores):
+        raise ValueError(f"{donde} debe ser una lista no vacía de enteros entre 0 y {tope - 1}, no {valores!r}.")
+    return valores
+
+
+def _validar_tarifa(t) -> dict:
+    """Comprueba claves, tipos y rangos de una tarifa para que `facturar` no falle después; lanza ValueError."""
+    if not isinstance(t, dict) or not isinstance(t.get('nombre'), str) or not t['nombre'].strip():
+        raise ValueError(f"Cada tarifa debe ser un objeto con 'nombre' de texto, no {t!r}.")
+    nombre = t['nombre']
+    for clave in ('cargo_fijo', 'precio_kwh_base', 'cargo_demanda_kw'):
+        if clave in t: _numero(t[clave], f"'{nombre}': {clave}")
+    periodos = t.get('periodos') or []
+    if not isinstance(periodos, list): raise ValueError(f"'{nombre}': periodos debe ser una lista.")
+    for j, p in enumerate(periodos):
+        donde = f"'{nombre}', periodo {p.get('nombre', j + 1) if isinstance(p, dict) else j + 1}"
+        if not isinstance(p, dict) or 'precio_kwh' not in p: raise ValueError(f"{donde}: falta precio_kwh.")
+        _numero(p['precio_kwh'], f"{donde}: precio_kwh")
+        if 'dias' in p: _enteros(p['dias'], f"{donde}: dias", 7)
+        if 'horas' in p: _enteros(p['horas'], f"{donde}: horas", 24)
+    bloques = t.get('bloques') or []
+    if not isinstance(bloques, list): raise ValueError(f"'{nombre}': bloques debe ser una lista.")
+    anterior = 0.0
+    for k, b in enumerate(bloques):
+        donde = f"'{nombre}', bloque {k + 1}"
+        if not isinstance(b, list) or len(b) != 2: raise ValueError(f"{donde}: debe ser un par [limite_kwh_mes | null, recargo], no {b!r}.")
+        limite, recargo = b
+        _numero(recargo, f"{donde}: recargo")
+        if limite is None:
+            if k != len(bloques) - 1: raise ValueError(f"{donde}: solo el último bloque puede no tener límite.")
+        elif _numero(limite, f"{donde}: límite") <= anterior: raise ValueError(f"{donde}: los límites deben ser positivos y crecientes.")
+        else: anterior = float(limite)
+    return t
+
+
+def cargar_tarifas(fuente=RUTA_TARIFAS) -> list:
+    """Lista de tarifas desde una ruta o archivo JSON. Valida cada tarifa y lanza ValueError con un error legible."""
+    if hasattr(fuente, 'read'): tarifas = json.load(fuente)
+    else:
+        with open(fuente, encoding='utf-8') as f: tarifas = json.load(f)
+    if not isinstance(tarifas, list) or not tarifas: raise ValueError("El JSON de tarifas debe ser una lista no vacía de objetos.")
+    return [_validar_tarifa(t) for t in tarifas]
+
+
+class BaseFacturacion:
+    """Lo que la facturación necesita de un dataset, calculado una sola vez.
+
+    `energia` (meses, 168) kWh por mes y ranura semanal, `pico` (meses,) kW máximo mensual y `meses` las etiquetas.
+    """
+
+    def __init__(self, energia: np.ndarray, pico: np.ndarray, meses: list):
+        self.energia, self.pico, self.meses = energia, pico, meses
+
+    @classmethod
+    def desde_serie(cls, serie: pd.Series, horas_muestra: float = None) -> 'BaseFacturacion':
+        """Desde una serie de kW de cualquier resolución; la energía de cada muestra es kW x duración."""
+        serie = serie.dropna(); idx = serie.index
+        horas_muestra = horas_por_muestra(idx) if horas_muestra is None else horas_muestra
+        codigos, meses = pd.factorize(idx.year * 100 + idx.month, sort=True)
+        ranura = idx.dayofweek.to_numpy() * 24 + idx.hour.to_numpy()
+        valores = serie.to_numpy(dtype='float64')
+        energia = np.bincount(codigos * RANURAS_SEMANA + ranura, weights=valores * horas_muestra, minlength=len(meses) * RANURAS_SEMANA)
+        pico = np.full(len(meses), -np.inf); np.maximum.at(pico, codigos, valores)
+        return cls(energia.reshape(len(meses), RANURAS_SEMANA), pico, [f"{m // 100}-{m % 100:02d}" for m in meses])
+
+    @classmethod
+    def desde_cubo(cls, cubo: CuboAgregado, factores: np.ndarray) -> 'BaseFacturacion':
+        """Desde el cubo agregado y los factores del escenario (año típico: meses de distintos años se suman).
+
+        La energía usa la duración de muestra del cubo y el pico mensual es el de demanda a resolución nativa.
+        """
+        con_datos = cubo.cuenta.sum(axis=(0, 1)) > 0
+        energia = (cubo.suma * factores[:, None, None] * cubo.horas_muestra).transpose(2, 1, 0).reshape(12, RANURAS_SEMANA)
+        pico = np.where(cubo.cuenta > 0, cubo.maximo * factores[:, None, None], -np.inf).max(axis=(0, 1))
+        nombres = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+        return cls(energia[con_datos], pico[con_datos], [n for n, c in zip(nombres, con_datos) if c])
+
+
+def _matrices(tarifas: list) -> tuple:
+    """Precio por ranura (T, 168), límites y recargos de bloques (T, K), cargo de demanda y fijo (T,)."""
+    T = len(tarifas); K = max([len(t.get('bloques') or []) for t in tarifas] + [1])
+    precio = np.empty((T, RANURAS_SEMANA)); limites = np.full((T, K), np.inf); recargos = np.zeros((T, K))
+    for i, t in enumerate(tarifas):
+        precio[i] = float(t.get('precio_kwh_base', 0.0))
+        for p in t.get('periodos') or []:
+            dias = np.asarray(p.get('dias', range(7)), dtype=np.int64); horas = np.asarray(p.get('horas', range(24)), dtype=np.int64)
+            precio[i, (dias[:, None] * 24 + horas[None, :]).ravel()] = float(p['precio_kwh'])
+        for k, (limite, recargo) in enumerate(t.get('bloques') or []):
+            limites[i, k] = np.inf if limite is None else float(limite); recargos[i, k] = float(recargo)
+    demanda = np.array([float(t.get('cargo_demanda_kw', 0.0)) for t in tarifas])
+    fijo = np.array([float(t.get('cargo_fijo', 0.0)) for t in tarifas])
+    return precio, limites, recargos, demanda, fijo
+
+
+def facturar(base: BaseFacturacion, tarifas: list) -> tuple:
+    """Factura todas las tarifas en una pasada. Devuelve (resumen por tarifa, detalle mensual total por tarifa)."""
+    precio, limites, recargos, demanda, fijo = _matrices(tarifas)
+    energia_mes = base.energia.sum(axis=1)                                                     # (M,)
+    costo_energia = precio @ base.energia.T                                                    # (T, M)
+    inferiores = np.concatenate([np.zeros((len(tarifas), 1)), limites[:, :-1]], axis=1)        # (T, K)
+    ancho = np.subtract(limites, inferiores, out=np.zeros_like(limites), where=~np.isinf(inferiores))  # relleno -> 0
+    kwh_bloque = np.clip(energia_mes[None, None, :] - inferiores[..., None], 0, ancho[..., None])  # (T, K, M)
+    costo_bloques = (kwh_bloque * recargos[..., None]).sum(axis=1)                             # (T, M)
+    costo_demanda = demanda[:, None] * np.maximum(base.pico, 0)[None, :]                       # (T, M)
+    costo_fijo = np.repeat(fijo[:, None], len(base.meses), axis=1)
+    total = costo_energia + costo_bloques + costo_demanda + costo_fijo
+    kwh_total = energia_mes.sum()
+    nombres = [t['nombre'] for t in tarifas]
+    resumen = pd.DataFrame({
+        'Tarifa': nombres, 'Energía ($)': costo_energia.sum(axis=1), 'Bloques ($)': costo_bloques.sum(axis=1),
+        'Demanda ($)': costo_demanda.sum(axis=1), 'Fijo ($)': costo_fijo.sum(axis=1), 'Total ($)': total.sum(axis=1),
+        'Costo medio ($/kWh)': total.sum(axis=1) / kwh_total if kwh_total > 0 else np.nan,
+    })
+    detalle = pd.DataFrame(total, index=pd.Index(nombres, name='Tarifa'), columns=base.meses)
+    return resumen, detalle
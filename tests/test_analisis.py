@@ -0,0 +1,35 @@
+# tests/test_analisis.py
+"""Consumo anual del dashboard y del barrido de escenarios a partir del cubo agregado."""
+from datetime import time
+import pandas as pd
+import pytest
+from analisis import CuboAgregado, barrido_escenarios, calcular_escenario
+
+
+def cubo_constante(inicio: str, fin: str, freq: str = 'h') -> CuboAgregado:
+    idx = pd.date_range(inicio, fin, freq=freq)
+    return CuboAgregado.desde_serie(pd.Series(1.0, index=idx))
+
+
+@pytest.mark.parametrize('year, horas', [(2023, 8760), (2024, 8784)])
+def test_ano_completo_no_se_extrapola(year, horas):
+    # Un año calendario completo a 1 kW: el consumo anual es su propio total, también si es bisiesto
+    cubo = cubo_constante(f'{year}-01-01', f'{year}-12-31 23:45', '15min')
+    resultado = calcular_escenario(cubo, "Normal", 50, time(6, 0), time(18, 0))
+    assert resultado['total_kwh_anual'] == pytest.approx(horas)
+    assert resultado['metrics_dashboard']['consumo_anual_kwh'] == pytest.approx(horas)
+    barrido = barrido_escenarios(cubo, escenarios=["Normal"], repartos=[50], ventanas=[(time(6, 0), time(18, 0))])
+    assert barrido['consumo_anual_kwh'].iloc[0] == pytest.approx(horas)
+
+
+def test_periodo_parcial_se_extrapola_al_ano_de_los_datos():
+    # Enero de 2024 (744 h) a 1 kW se extrapola a las 8784 h de 2024
+    cubo = cubo_constante('2024-01-01', '2024-01-31 23:00')
+    consumo = calcular_escenario(cubo, "Normal", 50, time(6, 0), time(18, 0))['metrics_dashboard']['consumo_anual_kwh']
+    assert consumo == pytest.approx(8784)
+
+
+def test_varios_anos_dan_el_promedio_anual():
+    cubo = cubo_constante('2023-01-01', '2024-12-31 23:00')
+    consumo = calcular_escenario(cubo, "Normal", 50, time(6, 0), time(18, 0))['metrics_dashboard']['consumo_anual_kwh']
+    assert cubo.horas_ano == 8772 and consumo == pytest.approx((8760 + 8784) / 2)
@@ -0,0 +1,102 @@
+# tests/test_ingesta.py
+"""Lectura de series de medidores: formatos de fecha, zonas horarias, intervalos y unidades."""
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from ingesta import FormatoNoReconocido, TIPO_PERFIL, cargar_medidor, detectar_formato, leer_serie_por_bloques
+
+
+def archivo_csv(tiempos, potencia, columna='Potencia_kW') -> io.BytesIO:
+    fuente = io.BytesIO(pd.DataFrame({'Timestamp': tiempos, columna: potencia}).to_csv(index=False).encode('utf-8'))
+    fuente.name = 'serie.csv'
+    return fuente
+
+
+@pytest.mark.parametrize('freq, tam_bloque', [('h', 250_000), ('15min', 5_000)])
+def test_desfases_con_horario_de_verano(freq, tam_bloque):
+    # Un año de Nueva York: -05:00 en invierno y -04:00 en verano, con la hora repetida de noviembre
+    idx = pd.date_range('2024-01-01', '2024-12-31 23:45', freq=freq, tz='America/New_York')
+    potencia = (np.arange(len(idx)) % 24).astype(float)
+    df = leer_serie_por_bloques(archivo_csv([t.isoformat() for t in idx], potencia), tam_bloque=tam_bloque)
+    assert df.index.tz is not None and len(df) == len(idx)
+    assert (df.index == idx).all()
+    np.testing.assert_allclose(df['Potencia_kW'].to_numpy(), potencia)
+    assert df.index.hour[df.index.month == 7][0] == 0  # hora local también en verano
+
+
+def test_desfases_sin_zona_posible():
+    tiempos = ['2024-01-01T00:00:00-05:00', '2024-01-01T01:00:00+03:00', '2024-01-01T02:00:00-05:00', '2024-01-01T03:00:00+07:00']
+    with pytest.raises(FormatoNoReconocido, match='desfases UTC'):
+        leer_serie_por_bloques(archivo_csv(tiempos, [1.0] * 4))
+
+
+def test_formato_explicito_dia_primero():
+    # 01/02 es 1 de febrero con formato día/mes; sin formato explícito se tomaría 2 de enero
+    tiempos = ['01/02/2024 00:00', '01/02/2024 01:00', '01/02/2024 02:00']
+    df = leer_serie_por_bloques(archivo_csv(tiempos, [1.0, 2.0, 3.0]), formato_fecha='%d/%m/%Y %H:%M')
+    assert df.index[0] == pd.Timestamp('2024-02-01 00:00')
+    np.testing.assert_allclose(df['Potencia_kW'].to_numpy(), [1.0, 2.0, 3.0])
+
+
+def test_watts_a_kw():
+    idx = pd.date_range('2024-01-01', periods=48, freq='h')
+    df = leer_serie_por_bloques(archivo_csv(idx.strftime('%Y-%m-%d %H:%M'), np.full(48, 2500.0), columna='Potencia_W'))
+    assert df.attrs['convertido_w']
+    np.testing.assert_allclose(df['Potencia_kW'].to_numpy(), 2.5)
+
+
+def test_duplicados_se_promedian_y_huecos_se_rellenan():
+    tiempos = ['2024-01-01 00:00', '2024-01-01 00:00', '2024-01-01 01:00', '2024-01-01 03:00']
+    df = leer_serie_por_bloques(archivo_csv(tiempos, [1.0, 3.0, 5.0, 7.0]))
+    assert list(df.index.strftime('%H')) == ['00', '01', '02', '03']
+    np.testing.assert_allclose(df['Potencia_kW'].to_numpy(), [2.0, 5.0, 5.0, 7.0])
+
+
+def test_bloques_pequenos_dan_lo_mismo():
+    idx = pd.date_range('2024-01-01', periods=24 * 40, freq='h')
+    potencia = np.random.default_rng(0).random(len(idx))
+    un_bloque = leer_serie_por_bloques(archivo_csv(idx.strftime('%Y-%m-%d %H:%M'), potencia))
+    por_bloques = leer_serie_por_bloques(archivo_csv(idx.strftime('%Y-%m-%d %H:%M'), potencia), tam_bloque=100)
+    pd.testing.assert_frame_equal(un_bloque, por_bloques)
+
+
+@pytest.mark.parametrize('freq, minutos', [('1min', 1), ('5min', 5), ('15min', 15), ('h', 60), ('2h', 60)])
+def test_intervalo_nativo(freq, minutos):
+    # Se conserva la resolución del medidor; pasos mayores a una hora se leen como horarios
+    idx = pd.date_range('2024-03-01', periods=500, freq=freq)
+    df = leer_serie_por_bloques(archivo_csv(idx.strftime('%Y-%m-%d %H:%M'), np.ones(len(idx))))
+    assert df.index.freq == pd.Timedelta(minutes=minutos)
+    assert df.index[0] == idx[0] and df.index[-1] == idx[-1].floor(f'{minutos}min')
+
+
+def test_intervalo_con_pasos_irregulares():
+    # Pasos de 14 y 16 minutos (reloj del medidor con deriva): mediana 15 -> 15 min, y cada muestra cae en su cuarto de hora
+    tiempos = pd.to_datetime('2024-01-01 00:01') + pd.to_timedelta(np.cumsum([0] + [14, 16] * 50), unit='min')
+    df = leer_serie_por_bloques(archivo_csv(tiempos.strftime('%Y-%m-%d %H:%M'), np.arange(101.0)))
+    assert df.index.freq == pd.Timedelta(minutes=15) and df.index[1] == pd.Timestamp('2024-01-01 00:15')
+    np.testing.assert_allclose(df['Potencia_kW'].to_numpy(), np.arange(101.0))  # sin cuartos repetidos ni vacíos
+
+
+def test_intervalo_h_promedia_por_hora():
+    # 15 min promediados por hora de reloj: la energía (kW x horas) se conserva
+    idx = pd.date_range('2024-01-01', periods=96 * 3, freq='15min')
+    potencia = np.tile([1.0, 2.0, 3.0, 6.0], 24 * 3)
+    nativo = leer_serie_por_bloques(archivo_csv(idx.strftime('%Y-%m-%d %H:%M'), potencia))
+    horario = leer_serie_por_bloques(archivo_csv(idx.strftime('%Y-%m-%d %H:%M'), potencia), intervalo='h', tam_bloque=50)
+    assert horario.index.freq == pd.Timedelta(hours=1) and len(horario) == 72
+    np.testing.assert_allclose(horario['Potencia_kW'].to_numpy(), 3.0)
+    assert horario['Potencia_kW'].sum() * 1.0 == pytest.approx(nativo['Potencia_kW'].sum() * 0.25)
+
+
+def test_perfil_detras_de_una_portada():
+    # La detección debe recorrer todas las hojas, igual que el lector de perfiles
+    from openpyxl import Workbook
+    libro = Workbook(); libro.active.title = 'Portada'; libro.active.append(['Inventario de cargas'])
+    for nombre, potencia in (('Cocina', 1000), ('Oficina', 60)):
+        hoja = libro.create_sheet(nombre); hoja.append(['Perfil']); hoja.append([])
+        hoja.append(['Carga', 'Potencia (W)'] + [str(h) for h in range(24)]); hoja.append([nombre, potencia] + [1 if 8 <= h < 18 else 0 for h in range(24)])
+    fuente = io.BytesIO(); libro.save(fuente); fuente.name = 'perfil.xlsx'
+    assert detectar_formato(fuente).tipo == TIPO_PERFIL
+    perfil = cargar_medidor(fuente, year=2024)
+    assert perfil['Potencia_kW'].max() == pytest.approx(1.06)
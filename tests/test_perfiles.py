@@ -0,0 +1,41 @@
+# tests/test_perfiles.py
+"""generar_perfil debe dar exactamente el mismo perfil que el bucle original por electrodoméstico con `.loc`."""
+import numpy as np
+import pandas as pd
+import pytest
+from perfiles import generar_perfil
+
+
+def generar_perfil_original(items: list, year: int) -> pd.DataFrame:
+    """Implementación previa a la plantilla semanal (app.generar_perfil_manual), como referencia."""
+    idx = pd.date_range(start=f'{year}-01-01 00:00', end=f'{year}-12-31 23:00', freq='h'); idx.name = 'Timestamp'
+    perfil = pd.DataFrame(0.0, index=idx, columns=['Potencia_kW'])
+    for item in items:
+        potencia_kw = (item['potencia_w'] * item['cantidad']) / 1000.0
+        dias_de_uso = list(range(item['dias_por_semana']))
+        horas_de_uso = item['horas_de_uso']
+        if not horas_de_uso: continue
+        filtro_dias = perfil.index.dayofweek.isin(dias_de_uso)
+        filtro_horas = perfil.index.hour.isin(horas_de_uso)
+        perfil.loc[filtro_dias & filtro_horas, 'Potencia_kW'] += potencia_kw
+    return perfil
+
+
+def items_aleatorios(n: int, semilla: int) -> list:
+    rng = np.random.default_rng(semilla)
+    return [{"nombre": f"Carga {i}", "cantidad": int(rng.integers(1, 10)), "potencia_w": float(rng.uniform(0.5, 3000)),
+             "dias_por_semana": int(rng.integers(1, 8)), "horas_de_uso": sorted(rng.choice(24, int(rng.integers(0, 25)), replace=False).tolist())}
+            for i in range(n)]
+
+
+@pytest.mark.parametrize('year', [2023, 2024])
+@pytest.mark.parametrize('n_items', [1, 7, 60])
+def test_identico_al_bucle_original(year, n_items):
+    items = items_aleatorios(n_items, semilla=n_items)
+    pd.testing.assert_frame_equal(generar_perfil(items, year), generar_perfil_original(items, year), check_exact=True, check_freq=True)
+
+
+def test_items_repetidos_y_sin_horas():
+    foco = {"nombre": "Foco LED", "cantidad": 5, "potencia_w": 10, "dias_por_semana": 7, "horas_de_uso": [18, 19, 20, 21]}
+    items = [foco, dict(foco), {**foco, "horas_de_uso": []}, {**foco, "potencia_w": 0.1, "dias_por_semana": 1, "horas_de_uso": list(range(24))}]
+    pd.testing.assert_frame_equal(generar_perfil(items, 2025), generar_perfil_original(items, 2025), check_exact=True, check_freq=True)
@@ -0,0 +1,63 @@
+# tests/test_tarifas.py
+"""Facturación vectorizada: una factura calculada a mano, cubo frente a serie y validación de tarifas."""
+import io
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from analisis import CuboAgregado, ajustar_serie
+from tarifas import BaseFacturacion, cargar_tarifas, facturar
+
+TARIFA = {"nombre": "Mixta", "cargo_fijo": 10.0, "precio_kwh_base": 0.10, "cargo_demanda_kw": 2.0,
+          "periodos": [{"nombre": "Punta", "dias": [0, 1, 2, 3, 4], "horas": [18, 19, 20, 21, 22], "precio_kwh": 0.30},
+                       {"nombre": "Valle", "horas": [0, 1, 2, 3, 4, 5], "precio_kwh": 0.05}],
+          "bloques": [[100, 0.0], [500, 0.02], [None, 0.05]]}
+
+
+def test_factura_calculada_a_mano():
+    # Enero 2024 (empieza en lunes, 23 días laborables) a 1 kW, salvo el lunes 1 a las 19:00 a 5 kW
+    idx = pd.date_range('2024-01-01', '2024-01-31 23:00', freq='h')
+    serie = pd.Series(1.0, index=idx); serie['2024-01-01 19:00'] = 5.0
+    resumen, detalle = facturar(BaseFacturacion.desde_serie(serie), [TARIFA])
+    fila = resumen.iloc[0]
+    # Punta: 23 días x 5 h + 4 kWh del pico = 119 kWh a 0.30; Valle: 31 x 6 = 186 kWh a 0.05; resto: 748 - 305 = 443 kWh a 0.10
+    assert fila['Energía ($)'] == pytest.approx(119 * 0.30 + 186 * 0.05 + 443 * 0.10)
+    # 748 kWh en el mes: 100 a 0, 400 a 0.02 y 248 a 0.05
+    assert fila['Bloques ($)'] == pytest.approx(400 * 0.02 + 248 * 0.05)
+    assert fila['Demanda ($)'] == pytest.approx(5 * 2.0)
+    assert fila['Fijo ($)'] == pytest.approx(10.0)
+    assert fila['Total ($)'] == pytest.approx(89.30 + 20.40 + 10.0 + 10.0)
+    assert fila['Costo medio ($/kWh)'] == pytest.approx(129.70 / 748)
+    assert list(detalle.columns) == ['2024-01'] and detalle.loc['Mixta', '2024-01'] == pytest.approx(129.70)
+
+
+def test_cubo_igual_que_serie_ajustada():
+    # Con un solo año, el cubo con factores debe facturar lo mismo que la serie completa ajustada
+    idx = pd.date_range('2025-01-01', '2025-12-31 23:45', freq='15min')
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({'Potencia_kW': rng.gamma(2.0, 1.5, len(idx))}, index=idx)
+    factores = rng.uniform(0.6, 1.4, 24)
+    desde_cubo = BaseFacturacion.desde_cubo(CuboAgregado.desde_serie(df['Potencia_kW']), factores)
+    desde_serie = BaseFacturacion.desde_serie(ajustar_serie(df, factores)['Potencia_kW'])
+    np.testing.assert_allclose(desde_cubo.energia, desde_serie.energia, rtol=1e-9)
+    np.testing.assert_allclose(desde_cubo.pico, desde_serie.pico, rtol=1e-9)
+    tarifas = cargar_tarifas()
+    pd.testing.assert_frame_equal(facturar(desde_cubo, tarifas)[0], facturar(desde_serie, tarifas)[0], rtol=1e-9)
+
+
+@pytest.mark.parametrize('cambio, mensaje', [
+    ({"periodos": [{"nombre": "Punta", "horas": [18, 24], "precio_kwh": 0.3}]}, "horas"),
+    ({"periodos": [{"nombre": "Punta", "dias": [7], "precio_kwh": 0.3}]}, "dias"),
+    ({"bloques": [[200, 0.0], [100, 0.02]]}, "crecientes"),
+    ({"bloques": [[None, 0.0], [100, 0.02]]}, "último bloque"),
+    ({"cargo_fijo": "3.50"}, "cargo_fijo"),
+    ({"cargo_demanda_kw": True}, "cargo_demanda_kw"),
+    ({"periodos": [{"nombre": "Punta", "precio_kwh": None}]}, "precio_kwh"),
+])
+def test_tarifas_invalidas(cambio, mensaje):
+    fuente = io.StringIO(json.dumps([{**TARIFA, **cambio}]))
+    with pytest.raises(ValueError, match=mensaje): cargar_tarifas(fuente)
+
+
+def test_json_que_no_es_lista():
+    with pytest.raises(ValueError, match="lista no vacía"): cargar_tarifas(io.StringIO(json.dumps(TARIFA)))
@@ -0,0 +1,66 @@
+# tests/test_trabajos.py
+"""Trabajos de carga compartidos: el dataset se libera cuando lo sueltan todas las sesiones, y la cancelación."""
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from almacen import AlmacenDatos
+from trabajos import CANCELADO, TERMINADO, GestorTrabajos
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    almacen = AlmacenDatos(str(tmp_path))
+    yield almacen
+    almacen.cerrar()
+
+
+def esperar(trabajo):
+    trabajo._futuro.result(timeout=10)
+    return trabajo
+
+
+def registrar_serie(almacen, progreso=None):
+    df = pd.DataFrame({'Potencia_kW': np.arange(48.0)}, index=pd.date_range('2025-01-01', periods=48, freq='h'))
+    return almacen.registrar(df, 'serie'), None
+
+
+def adoptar(gestor, almacen, trabajo, sesion):
+    """Lo que hace app.adoptar_carga: abre su propio manejador y suelta el del trabajo si era la última sesión."""
+    manejador = almacen.abrir(trabajo.resultado[0].clave)
+    if gestor.retirar(trabajo, sesion): trabajo.resultado[0].liberar()
+    return manejador
+
+
+def test_dataset_se_libera_al_soltarlo_todas_las_sesiones(almacen):
+    gestor = GestorTrabajos(workers=1)
+    trabajo = esperar(gestor.enviar('carga', registrar_serie, almacen, sesion='a'))
+    assert gestor.enviar('carga', registrar_serie, almacen, sesion='b') is trabajo and trabajo.estado == TERMINADO
+    assert almacen.estadisticas()['refs'] == {'serie': 1}  # solo el manejador del resultado
+    manejador_a = adoptar(gestor, almacen, trabajo, 'a')
+    assert almacen.estadisticas()['refs'] == {'serie': 2}  # 'b' aún no lo adoptó: el trabajo lo sostiene
+    manejador_b = adoptar(gestor, almacen, trabajo, 'b')
+    assert almacen.estadisticas()['refs'] == {'serie': 2} and gestor.obtener('carga') is None
+    manejador_a.liberar(); manejador_b.liberar()
+    assert almacen.estadisticas()['datasets'] == 0 and almacen.abrir('serie') is None
+
+
+def test_solo_cancelable_si_informa_progreso():
+    gestor = GestorTrabajos(workers=1)
+    en_marcha, seguir = threading.Event(), threading.Event()
+
+    def sin_progreso(progreso=None):
+        en_marcha.set(); seguir.wait(10)
+
+    def con_progreso(progreso=None):
+        progreso(filas=0); en_marcha.set(); seguir.wait(10); progreso(filas=1)
+
+    trabajo = gestor.enviar('sin', sin_progreso, sesion='a'); en_marcha.wait(10)
+    en_cola = gestor.enviar('cola', sin_progreso, sesion='a')
+    assert not trabajo.cancelable and en_cola.cancelable
+    en_cola.cancelar('a'); assert en_cola.estado == CANCELADO
+    seguir.set(); esperar(trabajo); en_marcha.clear(); seguir.clear()
+    trabajo = gestor.enviar('con', con_progreso, sesion='a'); en_marcha.wait(10)
+    assert trabajo.cancelable
+    trabajo.cancelar('a'); seguir.set(); esperar(trabajo)
+    assert trabajo.estado == CANCELADO and not trabajo.cancelable
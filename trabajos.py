@@ -0,0 +1,114 @@
+# trabajos.py
+"""Trabajos en segundo plano (ingesta, generación de perfiles, reportes) compartidos por todas las sesiones.
+
+Los trabajos se identifican por clave (p. ej. el hash del archivo): enviar dos veces la misma clave devuelve el
+trabajo en curso en lugar de repetirlo. La función recibe `progreso=` y lo llama por bloque con filas/bloques y,
+si la conoce, la fracción completada; esa misma llamada es el punto de cancelación (un trabajo que nunca la hace
+solo se puede cancelar mientras espera en cola, ver `Trabajo.cancelable`). Como varias sesiones pueden compartir un
+trabajo, cada una se suscribe al enviarlo y `cancelar(sesion)` solo la retira: el trabajo se detiene cuando no queda
+ninguna sesión suscrita. Cuando cada sesión ha tomado el resultado, `GestorTrabajos.retirar` la quita y, si era la
+última, olvida el trabajo para que quien lo envió pueda liberar lo que el resultado retiene.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+PENDIENTE, EJECUTANDO, TERMINADO, ERROR, CANCELADO = 'pendiente', 'ejecutando', 'terminado', 'error', 'cancelado'
+WORKERS_DEFECTO = int(os.environ.get('POWERSMART_WORKERS', 2))
+
+
+class TrabajoCancelado(Exception):
+    """Se lanza dentro del trabajo, desde `progreso`, cuando alguien pidió cancelarlo."""
+
+
+class Trabajo:
+    """Estado observable de un trabajo: lo escribe el hilo de trabajo y lo leen las sesiones en cada rerun."""
+
+    def __init__(self, clave: str, descripcion: str = ''):
+        self.clave, self.descripcion = clave, descripcion
+        self.estado = PENDIENTE; self.filas = 0; self.bloques = 0; self.fraccion = None
+        self.resultado = self.error = None; self.creado = time.time(); self.inicio = self.fin = None
+        self._cancelar = threading.Event(); self._futuro = None; self._suscriptores = set(); self._con_progreso = False
+
+    def avanzar(self, filas: int = None, bloques: int = None, fraccion: float = None):
+        self._con_progreso = True
+        if self._cancelar.is_set(): raise TrabajoCancelado(self.clave)
+        if filas is not None: self.filas = filas
+        if bloques is not None: self.bloques = bloques
+        if fraccion is not None: self.fraccion = min(max(fraccion, 0.0), 1.0)
+
+    def suscrito(self, sesion: str) -> bool: return sesion in self._suscriptores
+
+    def cancelar(self, sesion: str = None):
+        """Retira a `sesion` y detiene el trabajo si ya nadie lo sigue; sin `sesion` lo detiene para todas."""
+        if sesion is not None:
+            self._suscriptores.discard(sesion)
+            if self._suscriptores: return
+        self._cancelar.set()
+        if self._futuro is not None and self._futuro.cancel(): self.estado = CANCELADO; self.fin = time.time()
+
+    @property
+    def activo(self) -> bool: return self.estado in (PENDIENTE, EJECUTANDO)
+
+    @property
+    def cancelable(self) -> bool:
+        """Si `cancelar` lo detendría: sigue en cola o ya llamó a `progreso`, que es su punto de cancelación."""
+        return self.estado == PENDIENTE or (self.estado == EJECUTANDO and self._con_progreso)
+
+    @property
+    def segundos(self) -> float: return ((self.fin or time.time()) - self.inicio) if self.inicio else 0.0
+
+    def _ejecutar(self, funcion, args, kwargs):
+        if self._cancelar.is_set(): self.estado = CANCELADO; self.fin = time.time(); return
+        self.estado = EJECUTANDO; self.inicio = time.time()
+        try: self.resultado = funcion(*args, progreso=self.avanzar, **kwargs); self.fraccion = 1.0; self.estado = TERMINADO
+        except TrabajoCancelado: self.estado = CANCELADO
+        except Exception as e: self.error = e; self.estado = ERROR
+        finally: self.fin = time.time()
+
+
+class GestorTrabajos:
+    """Pool de hilos con deduplicación por clave. Conserva los últimos `max_terminados` trabajos acabados."""
+
+    def __init__(self, workers: int = WORKERS_DEFECTO, max_terminados: int = 64):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='powersmart-trabajo')
+        self._trabajos = OrderedDict(); self._lock = threading.Lock(); self.max_terminados = max_terminados
+
+    def enviar(self, clave: str, funcion, *args, descripcion: str = '', sesion: str = None, **kwargs) -> Trabajo:
+        """Devuelve el trabajo de esa clave si está activo o terminado con éxito; si no, lo lanza de nuevo.
+
+        `sesion` queda suscrita al trabajo (nuevo o existente) hasta que lo cancele.
+        """
+        with self._lock:
+            trabajo = self._trabajos.get(clave)
+            if trabajo is not None and (trabajo.activo or trabajo.estado == TERMINADO):
+                if sesion is not None: trabajo._suscriptores.add(sesion)
+                self._trabajos.move_to_end(clave); return trabajo
+            trabajo = Trabajo(clave, descripcion); self._trabajos[clave] = trabajo
+            if sesion is not None: trabajo._suscriptores.add(sesion)
+            trabajo._futuro = self._pool.submit(trabajo._ejecutar, funcion, args, kwargs)
+            self._podar()
+            return trabajo
+
+    def obtener(self, clave: str):
+        with self._lock: return self._trabajos.get(clave)
+
+    def retirar(self, trabajo: Trabajo, sesion: str = None) -> bool:
+        """Quita a `sesion` de un trabajo acabado. Si ya nadie lo sigue lo olvida y devuelve True: su resultado puede liberarse."""
+        with self._lock:
+            trabajo._suscriptores.discard(sesion)
+            if trabajo.activo or trabajo._suscriptores: return False
+            if self._trabajos.get(trabajo.clave) is trabajo: del self._trabajos[trabajo.clave]
+            return True
+
+    def _podar(self):
+        acabados = [c for c, t in self._trabajos.items() if not t.activo]
+        for clave in acabados[:max(0, len(acabados) - self.max_terminados)]: del self._trabajos[clave]
+
+    def estadisticas(self) -> dict:
+        with self._lock: trabajos = list(self._trabajos.values())
+        return {'activos': sum(t.activo for t in trabajos), 'terminados': sum(not t.activo for t in trabajos),
+                'trabajos': [{'clave': t.clave[:24], 'descripcion': t.descripcion, 'estado': t.estado, 'filas': t.filas,
+                              'bloques': t.bloques, 'segundos': round(t.segundos, 2)} for t in trabajos[-10:]]}